@@ -1,27 +1,69 @@
 import csv
-import io
 import json
-from typing import List, Dict
+import sys
+from itertools import chain
+from operator import itemgetter
+from typing import List, Dict, Iterable, Iterator
 
+try:
+	import orjson
+except ImportError:  # optional accelerator; stdlib json is the fallback
+	orjson = None
 
-def to_csv(rows: List[Dict]) -> bytes:
+
+class _Echo:
+	"""File-like sink that hands each formatted CSV line straight back to the caller."""
+	def write(self, value: str) -> str:
+		return value
+
+
+def iter_csv(rows: List[Dict]) -> Iterator[bytes]:
+	"""Yield the CSV export one encoded line at a time (header first).
+
+	Suitable for streaming: `Response(iter_csv(rows), mimetype="text/csv")`.
+	"""
 	if not rows:
-		return b""
-	# Collect all keys across rows for stable header
-	fieldnames = []
-	seen = set()
+		return
+	# Shape comes from the first row; interned names hash once and compare by identity
+	first_keys = rows[0].keys()
+	fieldnames = [sys.intern(k) if type(k) is str else k for k in first_keys]
+	width = len(fieldnames)
+	# len() is the cheap pre-filter; the keys-view comparison only runs on same-sized rows
+	homogeneous = all(len(r) == width and r.keys() == first_keys for r in rows)
+	if not homogeneous:
+		# Collect all keys across rows for stable header (first-seen order)
+		fieldnames = list(dict.fromkeys(chain(fieldnames, chain.from_iterable(r.keys() for r in rows))))
+		width = len(fieldnames)
+	writer = csv.writer(_Echo())
+	yield writer.writerow(fieldnames).encode("utf-8")
+	if homogeneous and width > 1:
+		# Homogeneous rows (the usual classification output): every row carries every
+		# field, so a C-level itemgetter replaces the per-row Python list build.
+		getter = itemgetter(*fieldnames)
+		for r in rows:
+			yield writer.writerow(getter(r)).encode("utf-8")
+		return
 	for r in rows:
-		for k in r.keys():
-			if k not in seen:
-				seen.add(k)
-				fieldnames.append(k)
-	out = io.StringIO()
-	writer = csv.DictWriter(out, fieldnames=fieldnames)
-	writer.writeheader()
+		yield writer.writerow([r.get(k) for k in fieldnames]).encode("utf-8")
+
+
+def iter_quoted_csv(fieldnames: List[str], rows: Iterable[Dict]) -> Iterator[bytes]:
+	"""Yield a CSV with a bare header line and every row value quoted, one encoded line at a time.
+
+	Lines are joined by "\n" with no trailing newline; missing keys and None become "".
+	"""
+	yield ",".join(fieldnames).encode("utf-8")
+	writer = csv.writer(_Echo(), quoting=csv.QUOTE_ALL, lineterminator="")
 	for r in rows:
-		writer.writerow({k: r.get(k) for k in fieldnames})
-	return out.getvalue().encode("utf-8")
+		yield ("\n" + writer.writerow([r.get(k) for k in fieldnames])).encode("utf-8")
+
+
+def to_csv(rows: List[Dict]) -> bytes:
+	return b"".join(iter_csv(rows))
 
 
 def to_json(rows: List[Dict]) -> bytes:
-	return json.dumps(rows, ensure_ascii=False).encode("utf-8")
\ No newline at end of file
+	if orjson is not None:
+		# Emits UTF-8 bytes directly and serializes Firestore datetimes natively
+		return orjson.dumps(rows, option=orjson.OPT_NON_STR_KEYS)
+	return json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8")
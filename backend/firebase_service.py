@@ -1,59 +1,116 @@
 import os
 import json
-from datetime import datetime
-from typing import Optional, Dict, Any
+import atexit
+import hashlib
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
 import firebase_admin
 from firebase_admin import credentials, firestore
 from firebase_admin.exceptions import FirebaseError
+from google.api_core.retry import Retry, if_transient_error
+
+log = logging.getLogger(__name__)
+
+# Fields returned for cached classifications: everything classify_url stores except
+# the server-side 'timestamp'. Add new result fields here or they won't be read back.
+CLASSIFICATION_PUBLIC_FIELDS = [
+    'url', 'url_normalized', 'user_id', 'taxonomy_version',
+    'iab_category', 'iab_code', 'iab_subcategory', 'iab_subcode',
+    'iab_secondary_category', 'iab_secondary_code',
+    'iab_secondary_subcategory', 'iab_secondary_subcode',
+    'tone', 'intent', 'audience', 'keywords', 'buying_intent', 'ad_suggestions',
+    '_validation',
+]
+
+# Firestore rejects commits with more than 500 writes
+MAX_BATCH_WRITES = 500
+# Refs per get_all() call, keeping responses well under the 10MB cap
+MAX_BATCH_READS = 300
+# Concurrent batch commits; throughput gains flatten out around 40
+MAX_COMMIT_WORKERS = 40
+_COMMIT_RETRY = Retry(predicate=if_transient_error, deadline=30)
+# How long the write-behind flusher gathers queued writes before committing
+FLUSH_INTERVAL_SECONDS = 0.05
+# Longest flush() waits for queued writes before giving up
+FLUSH_TIMEOUT_SECONDS = 30
+# Bounded memory of this process's own writes, used by save_if_newer to skip reads
+RECENT_WRITE_TTL_SECONDS = 300
+MAX_RECENT_WRITES = 4096
+
+
+@lru_cache(maxsize=4096)
+def _doc_id(url: str) -> str:
+    # MD5 is kept (not a security use) so IDs stay stable for documents already stored
+    return f"url_{hashlib.md5(url.encode()).hexdigest()}"
+
+
+def _as_utc(ts: datetime) -> datetime:
+    # Callers may pass naive UTC datetimes while Firestore returns aware ones; compare in UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
 
 class FirebaseService:
     def __init__(self):
         """Initialize Firebase Admin SDK and Firestore client."""
         try:
-            print("🔧 Initializing Firebase service...")
+            log.debug("🔧 Initializing Firebase service...")
             
             # Check if Firebase app is already initialized
             if not firebase_admin._apps:
-                print("📋 No existing Firebase apps found, initializing...")
+                log.debug("📋 No existing Firebase apps found, initializing...")
                 
                 # Initialize with service account key from environment
                 service_account_info = os.getenv("FIREBASE_SERVICE_ACCOUNT")
-                print(f"🔑 Environment variable found: {'Yes' if service_account_info else 'No'}")
+                log.debug("🔑 Environment variable found: %s", 'Yes' if service_account_info else 'No')
                 
                 if service_account_info:
-                    print("📄 Parsing service account JSON...")
+                    log.debug("📄 Parsing service account JSON...")
                     try:
                         # Parse the JSON service account info
                         cred_dict = json.loads(service_account_info)
-                        print(f"✅ JSON parsed successfully. Project ID: {cred_dict.get('project_id', 'Unknown')}")
+                        log.debug("✅ JSON parsed successfully. Project ID: %s", cred_dict.get('project_id', 'Unknown'))
                         cred = credentials.Certificate(cred_dict)
-                        print("🔐 Certificate created successfully")
+                        log.debug("🔐 Certificate created successfully")
                     except json.JSONDecodeError as e:
-                        print(f"❌ JSON parsing error: {e}")
+                        log.error("❌ JSON parsing error: %s", e)
                         raise
                     except Exception as e:
-                        print(f"❌ Certificate creation error: {e}")
+                        log.error("❌ Certificate creation error: %s", e)
                         raise
                 else:
-                    print("⚠️  No service account found, using default credentials")
+                    log.debug("⚠️  No service account found, using default credentials")
                     # Fallback to default credentials (for local development)
                     cred = credentials.ApplicationDefault()
                 
-                print("🚀 Initializing Firebase Admin SDK...")
+                log.debug("🚀 Initializing Firebase Admin SDK...")
                 firebase_admin.initialize_app(cred)
-                print("✅ Firebase Admin SDK initialized successfully")
+                log.debug("✅ Firebase Admin SDK initialized successfully")
             else:
-                print("✅ Firebase app already initialized")
+                log.debug("✅ Firebase app already initialized")
             
-            print("🗄️  Initializing Firestore client...")
+            log.debug("🗄️  Initializing Firestore client...")
             self.db = firestore.client()
             self.collection_name = "classified_urls"
-            print("✅ Firebase service initialization complete")
+            self._write_queue: "queue.Queue[Tuple[str, Dict[str, Any], threading.Event]]" = queue.Queue()
+            # url -> Event of its latest queued write, cleared once committed
+            self._pending_writes: Dict[str, threading.Event] = {}
+            self._pending_lock = threading.Lock()
+            self._flusher_thread: Optional[threading.Thread] = None
+            self._flusher_lock = threading.Lock()
+            # url -> (timestamp this process last wrote, monotonic expiry)
+            self._recent_writes: Dict[str, Tuple[datetime, float]] = {}
+            self._recent_writes_lock = threading.Lock()
+            log.debug("✅ Firebase service initialization complete")
             
         except Exception as e:
-            print(f"❌ Firebase initialization error: {e}")
-            import traceback
-            print(f"📋 Full traceback: {traceback.format_exc()}")
+            # log.exception attaches the traceback; no format_exc() string is built up front
+            log.exception("❌ Firebase initialization error: %s", e)
             raise
     
     def get_classification_by_url(self, url: str) -> Optional[Dict[str, Any]]:
@@ -70,13 +127,11 @@ class FirebaseService:
             # Create a document ID from the URL (hash or sanitized)
             doc_id = self._create_doc_id(url)
             doc_ref = self.db.collection(self.collection_name).document(doc_id)
-            doc = doc_ref.get()
+            # Project server-side so only the public fields (no timestamp) are transferred
+            doc = doc_ref.get(field_paths=CLASSIFICATION_PUBLIC_FIELDS)
             
             if doc.exists:
-                data = doc.to_dict()
-                # Remove Firestore metadata fields
-                data.pop('timestamp', None)
-                return data
+                return doc.to_dict()
             return None
             
         except FirebaseError as e:
@@ -86,10 +141,30 @@ class FirebaseService:
             print(f"Unexpected error reading from Firestore: {e}")
             return None
     
+    def get_classifications_bulk(self, urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieve classification data for many URLs with batched get_all() reads.
+        
+        Args:
+            urls: The URLs to look up
+            
+        Returns:
+            Mapping of url -> classification data for the URLs that were found
+            
+        Raises:
+            Exception: if any chunk could not be read, so callers never mistake an
+            unread URL for an unclassified one; fall back to get_classification_by_url
+        """
+        return self._get_all_by_url(self.collection_name, urls, field_paths=CLASSIFICATION_PUBLIC_FIELDS)
+    
     def save_classification(self, url: str, classification_data: Dict[str, Any]) -> bool:
         """
         Save classification data to Firestore.
         
+        This is a blind write: it unconditionally overwrites any existing document for
+        the URL without reading it first. Use save_if_newer when an older result must
+        not replace a fresher one.
+        
         Args:
             url: The URL that was classified
             classification_data: The classification results
@@ -101,7 +176,7 @@ class FirebaseService:
             # Add URL and timestamp to the data
             data_to_save = classification_data.copy()
             data_to_save['url'] = url
-            data_to_save['timestamp'] = datetime.utcnow()
+            data_to_save['timestamp'] = datetime.now(timezone.utc)
             
             # Create document ID from URL
             doc_id = self._create_doc_id(url)
@@ -109,7 +184,6 @@ class FirebaseService:
             
             # Save to Firestore
             doc_ref.set(data_to_save)
-            return True
             
         except FirebaseError as e:
             print(f"Firestore write error: {e}")
@@ -117,6 +191,167 @@ class FirebaseService:
         except Exception as e:
             print(f"Unexpected error writing to Firestore: {e}")
             return False
+        # Outside the try: the document is committed, so bookkeeping can't turn this into a failure
+        self._remember_write(url, data_to_save['timestamp'])
+        return True
+    
+    def save_if_newer(self, url: str, classification_data: Dict[str, Any]) -> bool:
+        """
+        Save classification data only if it is newer than what is already stored.
+        
+        The stored timestamp is compared inside a Firestore transaction. Timestamps this
+        process wrote recently are remembered for RECENT_WRITE_TTL_SECONDS, so a stale
+        save can be rejected without reading the document at all.
+        
+        Args:
+            url: The URL that was classified
+            classification_data: The classification results; 'timestamp' defaults to now
+            
+        Returns:
+            True if the data was written, False if it was stale or the write failed
+        """
+        new_ts = _as_utc(classification_data.get('timestamp') or datetime.now(timezone.utc))
+        known_ts = self._recent_write_ts(url)
+        if known_ts is not None and new_ts <= known_ts:
+            return False
+        
+        doc_ref = self.db.collection(self.collection_name).document(self._create_doc_id(url))
+        data_to_save = {**classification_data, 'url': url, 'timestamp': new_ts}
+        
+        @firestore.transactional
+        def _write(transaction) -> bool:
+            snapshot = doc_ref.get(transaction=transaction)
+            if snapshot.exists:
+                existing_ts = (snapshot.to_dict() or {}).get('timestamp')
+                if isinstance(existing_ts, datetime) and _as_utc(existing_ts) >= new_ts:
+                    return False
+            transaction.set(doc_ref, data_to_save)
+            return True
+        
+        try:
+            written = _write(self.db.transaction())
+        except FirebaseError as e:
+            print(f"Firestore transactional write error: {e}")
+            return False
+        except Exception as e:
+            print(f"Unexpected error in transactional write to Firestore: {e}")
+            return False
+        if written:
+            self._remember_write(url, new_ts)
+        return written
+    
+    def _remember_write(self, url: str, ts: datetime) -> None:
+        with self._recent_writes_lock:
+            if len(self._recent_writes) >= MAX_RECENT_WRITES:
+                now = time.monotonic()
+                self._recent_writes = {u: v for u, v in self._recent_writes.items() if v[1] > now}
+                if len(self._recent_writes) >= MAX_RECENT_WRITES:
+                    self._recent_writes.clear()
+            self._recent_writes[url] = (_as_utc(ts), time.monotonic() + RECENT_WRITE_TTL_SECONDS)
+    
+    def _recent_write_ts(self, url: str) -> Optional[datetime]:
+        with self._recent_writes_lock:
+            entry = self._recent_writes.get(url)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+    
+    def save_classifications_bulk(self, items: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Save many classifications using batched writes (one commit per 500 docs).
+        
+        Args:
+            items: (url, classification_data) pairs
+            
+        Returns:
+            Number of documents written
+        """
+        return self._commit_in_batches(self._classification_writes(items))
+    
+    def enqueue_classification(self, url: str, classification_data: Dict[str, Any]) -> threading.Event:
+        """
+        Queue a classification write for the background flusher (write-behind).
+        
+        Queued writes are coalesced into batch commits every FLUSH_INTERVAL_SECONDS.
+        The trade-off is durability: a failed commit is only logged, and writes still
+        queued when the process is killed (rather than exiting normally) are lost.
+        Use save_classification when the document must be readable on return
+        (e.g. right before a merge); call flush() to wait for pending writes.
+        
+        Returns:
+            Event set once the commit holding this write has finished (or failed)
+        """
+        done = threading.Event()
+        with self._pending_lock:
+            self._pending_writes[url] = done
+        self._ensure_flusher()
+        self._write_queue.put((url, classification_data, done))
+        return done
+    
+    def flush(self, urls: Optional[List[str]] = None, timeout: float = FLUSH_TIMEOUT_SECONDS) -> bool:
+        """
+        Wait for queued writes of `urls` (all queued writes if None) to be committed.
+        
+        Only the latest write per URL is waited on: the single flusher commits in queue
+        order, so earlier writes for the same URL are done by then. Writes queued by
+        other requests for other URLs are not waited on.
+        
+        Returns:
+            False if `timeout` seconds passed with writes still pending
+        """
+        with self._pending_lock:
+            if urls is None:
+                events = list(self._pending_writes.values())
+            else:
+                events = [e for e in map(self._pending_writes.get, urls) if e is not None]
+        deadline = time.monotonic() + timeout
+        for event in events:
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+    
+    def _ensure_flusher(self) -> None:
+        thread = self._flusher_thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._flusher_lock:
+            if self._flusher_thread is None or not self._flusher_thread.is_alive():
+                if self._flusher_thread is None:
+                    atexit.register(self.flush)
+                thread = threading.Thread(target=self._flusher, name="firestore-flusher", daemon=True)
+                thread.start()
+                self._flusher_thread = thread
+    
+    def _flusher(self) -> None:
+        while True:
+            items = [self._write_queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            while len(items) < MAX_BATCH_WRITES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._write_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.save_classifications_bulk([(url, data) for url, data, _ in items])
+            except Exception as e:
+                # Keep the thread alive: later writes and flush() waiters depend on it
+                log.exception("Write-behind commit of %d classifications failed: %s", len(items), e)
+            finally:
+                with self._pending_lock:
+                    for url, _, done in items:
+                        done.set()
+                        if self._pending_writes.get(url) is done:
+                            del self._pending_writes[url]
+    
+    def _classification_writes(self, items: List[Tuple[str, Dict[str, Any]]]) -> list:
+        coll = self.db.collection(self.collection_name)
+        return [
+            (coll.document(_doc_id(url)), {**data, 'url': url, 'timestamp': firestore.SERVER_TIMESTAMP})
+            for url, data in items
+        ]
     
     def _create_doc_id(self, url: str) -> str:
         """
@@ -129,40 +364,54 @@ class FirebaseService:
         Returns:
             A string suitable for use as a Firestore document ID
         """
-        import hashlib
-        # Create a hash of the URL to use as document ID
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        return f"url_{url_hash}"
+        return _doc_id(url)
     
-    def get_recent_classifications(self, limit: int = 10) -> list:
+    def get_recent_classifications(self, limit: int = 10, start_after: Optional[str] = None) -> Dict[str, Any]:
         """
-        Get recent classifications from Firestore.
+        Get a page of recent classifications from Firestore.
+        
+        Documents are ordered by timestamp and then document ID: write-behind batch
+        commits give many documents the same server timestamp, so the cursor carries
+        both to resume exactly after the last item.
         
         Args:
             limit: Maximum number of records to return
+            start_after: next_cursor from a previous page ("<ISO timestamp>|<doc id>")
             
         Returns:
-            List of recent classification records
+            {"items": [...], "next_cursor": cursor after the last item, or None}
+            
+        Raises:
+            ValueError: if start_after is not a cursor returned by this method
         """
+        coll = self.db.collection(self.collection_name)
+        query = (coll.order_by('timestamp', direction=firestore.Query.DESCENDING)
+                 .order_by('__name__', direction=firestore.Query.DESCENDING)
+                 .limit(limit))
+        if start_after:
+            ts, sep, doc_id = start_after.rpartition('|')
+            if not sep or not doc_id or '/' in doc_id:
+                raise ValueError(f"Invalid cursor: {start_after!r}")
+            ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+            query = query.start_after({'timestamp': ts, '__name__': coll.document(doc_id)})
+        
         try:
-            docs = (self.db.collection(self.collection_name)
-                   .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                   .limit(limit)
-                   .stream())
-            
             results = []
-            for doc in docs:
-                data = doc.to_dict()
-                results.append(data)
+            last_doc = None
+            for doc in query.stream():
+                results.append(doc.to_dict())
+                last_doc = doc
             
-            return results
+            last_ts = results[-1].get('timestamp') if results else None
+            next_cursor = f"{last_ts.isoformat()}|{last_doc.id}" if isinstance(last_ts, datetime) else None
+            return {"items": results, "next_cursor": next_cursor}
             
         except FirebaseError as e:
             print(f"Firestore query error: {e}")
-            return []
+            return {"items": [], "next_cursor": None}
         except Exception as e:
             print(f"Unexpected error querying Firestore: {e}")
-            return []
+            return {"items": [], "next_cursor": None}
 
     def save_attribution_data(self, url: str, attribution_data: Dict[str, Any]) -> bool:
         """
@@ -192,6 +441,22 @@ class FirebaseService:
             print(f"Unexpected error writing attribution data to Firestore: {e}")
             return False
 
+    def add_attributions_bulk(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Add attribution records as new auto-ID documents using batched writes.
+        
+        Nothing is overwritten: each record becomes a new (versioned) document,
+        as with collection('attribution_data').add().
+        
+        Args:
+            records: Attribution data dicts
+            
+        Returns:
+            Number of documents written
+        """
+        coll = self.db.collection('attribution_data')
+        return self._commit_in_batches([(coll.document(), data) for data in records])
+
     def get_attribution_data_by_url(self, url: str) -> Optional[Dict[str, Any]]:
         """
         Get attribution data for a specific URL.
@@ -219,16 +484,66 @@ class FirebaseService:
             print(f"Unexpected error reading attribution data from Firestore: {e}")
             return None
 
+    def _commit_in_batches(self, writes: list) -> int:
+        """Commit (doc_ref, data) set() operations in WriteBatch chunks; returns docs written."""
+        chunks = [writes[i:i + MAX_BATCH_WRITES] for i in range(0, len(writes), MAX_BATCH_WRITES)]
+        if len(chunks) <= 1:
+            return sum(self._commit_chunk(c) for c in chunks)
+        # The Firestore client is thread-safe and shares one gRPC channel across workers
+        with ThreadPoolExecutor(max_workers=min(MAX_COMMIT_WORKERS, len(chunks))) as ex:
+            return sum(ex.map(self._commit_chunk, chunks))
+
+    def _commit_chunk(self, chunk: list) -> int:
+        try:
+            batch = self.db.batch()
+            for doc_ref, data in chunk:
+                batch.set(doc_ref, data)
+            batch.commit(retry=_COMMIT_RETRY)
+            return len(chunk)
+        except FirebaseError as e:
+            print(f"Firestore batch write error: {e}")
+        except Exception as e:
+            print(f"Unexpected error committing Firestore batch: {e}")
+        return 0
+
+    def _get_all_by_url(self, collection: str, urls: List[str],
+                        field_paths: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Fetch docs keyed by _doc_id(url) in get_all() chunks; returns url -> data.
+
+        A chunk that still fails after transient retries raises rather than leaving its
+        URLs out: a partial result would read as "not stored" for them.
+        """
+        coll = self.db.collection(collection)
+        url_by_id = {_doc_id(u): u for u in dict.fromkeys(urls) if u}
+        ids = list(url_by_id)
+        results: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(ids), MAX_BATCH_READS):
+            refs = [coll.document(doc_id) for doc_id in ids[start:start + MAX_BATCH_READS]]
+            try:
+                for doc in self.db.get_all(refs, field_paths=field_paths, retry=_COMMIT_RETRY):
+                    if doc.exists:
+                        results[url_by_id[doc.id]] = doc.to_dict()
+            except FirebaseError as e:
+                print(f"Firestore batch read error: {e}")
+                raise
+            except Exception as e:
+                print(f"Unexpected error batch reading from Firestore: {e}")
+                raise
+        return results
+
     def _get_timestamp(self):
         """Get current timestamp for Firestore."""
-        return datetime.utcnow()
+        return datetime.now(timezone.utc)
 
 # Global Firebase service instance
 firebase_service = None
+_firebase_service_lock = threading.Lock()
 
 def get_firebase_service() -> FirebaseService:
-    """Get or create the global Firebase service instance."""
+    """Get or create the global Firebase service instance (initialized once, even under threads)."""
     global firebase_service
     if firebase_service is None:
-        firebase_service = FirebaseService()
-    return firebase_service
\ No newline at end of file
+        with _firebase_service_lock:
+            if firebase_service is None:
+                firebase_service = FirebaseService()
+    return firebase_service
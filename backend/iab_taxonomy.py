@@ -2,24 +2,55 @@
 from __future__ import annotations
 import os
 import csv
+import functools
+import hashlib
+import mmap
+import pickle
+import sys
 import logging
 import io
-from typing import List, Dict, Tuple
-from flask import Blueprint, jsonify
+from typing import Iterable, Iterator, List, Dict, Tuple
+from flask import Blueprint, Response, jsonify, request
 from flask_cors import cross_origin
+from exporter import to_json
 import re
 import json
+import threading
+from array import array
+from collections import defaultdict
 from typing import Tuple
 import json as _json
 
+try:
+	import pyarrow as pa
+	import pyarrow.csv as pa_csv
+except ImportError:  # optional accelerator; csv.reader is the fallback
+	pa = pa_csv = None
+
 bp = Blueprint("iab", __name__)
 log = logging.getLogger("iab")
 
 _DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "data", "IAB_Content_Taxonomy_3_1.tsv")
-_IAB_CACHE: List[Dict] = []
-_IAB_PATH: str = ""
+_IAB_CACHE: Dict[str, List[Dict]] = {}  # resolved TSV path -> load_iab_taxonomy items
+_IAB_CACHE_MAX = 4
+_IAB_LOCK = threading.Lock()
+_IAB_JSON: Tuple[List[Dict], bytes, str] | None = None  # (items, serialized items, etag)
+_ETAG_MAX_AGE = 3600
+_PARSE_CACHE: Dict[str, Tuple[Tuple[int, int], List[Dict]]] = {}  # path -> ((st_mtime_ns, st_size), parse_iab_tsv result)
+_PARSE_LOCK = threading.Lock()
+# Bump whenever parse_iab_tsv's output changes so pickled sidecars from older code are ignored
+_PARSER_VERSION = 1
+_IAB31_JSON: Tuple[str, Tuple[int, int], bytes, str] | None = None  # (json path, (st_mtime_ns, st_size), /api/iab31 body, etag)
 _HEADERS_INFO: Tuple[list[str], str] | None = None  # (headers, path)
 
+# Patterns used per code on the loader/sort paths, compiled once
+_NATKEY_RE = re.compile(r'(\d+)')
+_CODE_TOKEN_RE = re.compile(r'[^\s,;]+')  # runs between the whitespace/comma/semicolon separators
+_DASH_TRANS = str.maketrans({'–': '-', '—': '-'})
+# One-pass table for normalize_code: drop every str.isspace() character (the last is U+3000) and fold dashes
+_NORM_TABLE = {c: None for c in range(0x3001) if chr(c).isspace()}
+_NORM_TABLE.update(_DASH_TRANS)
+
 # Known header variants
 CODE_FIELDS = [
 	"Code", "code", "IAB Code", "Taxonomy Code", "Legacy (V2) Code",
@@ -43,11 +74,97 @@ def _open_text_sig(path: str) -> io.TextIOBase:
 
 def _pick_first(row: dict, keys: list[str]) -> str | None:
 	for k in keys:
-		if k in row and row[k] is not None and str(row[k]).strip():
-			return str(row[k]).strip()
+		v = row.get(k)
+		if v is not None:
+			v = str(v).strip()
+			if v:
+				return v
 	return None
 
 
+@functools.lru_cache(maxsize=16)
+def _variant_columns(headers: Tuple[str, ...]) -> Tuple[list[int], list[int], list[int]]:
+	"""(code, name, tier) column indexes for a header row; files sharing a header resolve it once."""
+	headers = list(headers)
+	return (
+		_field_indexes(headers, CODE_FIELDS),
+		_field_indexes(headers, NAME_FIELDS),
+		_field_indexes(headers, TIER_FIELDS),
+	)
+
+
+def _field_indexes(headers: list[str], keys: list[str]) -> list[int]:
+	"""Column indexes of the known header variants present, in `keys` priority order."""
+	pos = {h: i for i, h in enumerate(headers)}
+	return [pos[k] for k in keys if k in pos]
+
+
+def _first_cell(row: list[str], idxs: list[int]) -> str | None:
+	"""csv.reader counterpart of _pick_first: first non-blank cell among `idxs`."""
+	for i in idxs:
+		if i < len(row):
+			v = row[i].strip()
+			if v:
+				return v
+	return None
+
+
+# Columns consumed by parse_iab_tsv, in the order its row loop unpacks them
+_PARSE_COLUMNS = ["Unique ID", "Parent", "Name", "Tier 1", "Tier 2", "Tier 3", "Tier 4"]
+
+
+def _read_tsv_columns(path: str, body: Iterable[bytes], quoted: bool, header_idx: int, headers: list[str], names: list[str]) -> Dict[str, list]:
+	"""Read the wanted TSV columns as parallel lists (missing columns come back blank).
+
+	Uses pyarrow's native CSV reader when it is installed. Otherwise `body` (the raw
+	lines after the header) is split on tabs directly, or run through csv.reader
+	when the file contains quote characters.
+	"""
+	wanted = [n for n in names if n in headers]
+	if pa_csv is not None:
+		table = pa_csv.read_csv(
+			path,
+			read_options=pa_csv.ReadOptions(skip_rows=header_idx),
+			parse_options=pa_csv.ParseOptions(delimiter="\t"),
+			convert_options=pa_csv.ConvertOptions(
+				include_columns=wanted,
+				column_types={n: pa.string() for n in wanted},
+				strings_can_be_null=False,
+			),
+		)
+		columns = {n: table.column(n).to_pylist() for n in wanted}
+		rows = table.num_rows
+	else:
+		# Resolve each wanted column to its index once, then read rows as plain lists
+		pos = {h: i for i, h in enumerate(headers)}
+		columns = {n: [] for n in wanted}
+		cols = [(columns[n], pos[n]) for n in wanted]
+		rows = 0
+		if quoted:
+			for row in csv.reader((raw.decode("utf-8") for raw in body), delimiter="\t"):
+				if not row:
+					continue
+				width = len(row)
+				for lst, i in cols:
+					lst.append(row[i] if i < width else None)
+				rows += 1
+		else:
+			# No quoting anywhere, so a tab split is exact; only the wanted cells get decoded
+			for raw in body:
+				line = raw.rstrip(b"\r\n")
+				if not line:
+					continue
+				cells = line.split(b"\t")
+				width = len(cells)
+				for lst, i in cols:
+					lst.append(cells[i].decode("utf-8") if i < width else None)
+				rows += 1
+	for n in names:
+		if n not in columns:
+			columns[n] = [""] * rows
+	return columns
+
+
 def parse_iab_tsv(tsv_path: str | None = None) -> List[Dict]:
 	"""Parse the official IAB 3.1 TSV and return deterministic codes with UI-friendly shape.
 
@@ -66,148 +183,290 @@ def parse_iab_tsv(tsv_path: str | None = None) -> List[Dict]:
 	- Deterministic across runs given same TSV
 	"""
 	path = tsv_path or _env_path()
-	if not os.path.exists(path):
+	try:
+		st = os.stat(path)
+	except FileNotFoundError:
 		raise RuntimeError(f"IAB TSV not found at {path}")
-
-	nodes: List[Dict] = []
+	# Memoized per path until the file's (mtime, size) changes; callers share the list, so treat it as read-only
+	sig = (st.st_mtime_ns, st.st_size)
+	cached = _PARSE_CACHE.get(path)
+	if cached is not None and cached[0] == sig:
+		return cached[1]
+	# Serialize cold parses so concurrent first requests parse the file only once
+	with _PARSE_LOCK:
+		cached = _PARSE_CACHE.get(path)
+		if cached is not None and cached[0] == sig:
+			return cached[1]
+		return _parse_iab_tsv_locked(path, sig)
+
+
+def _parse_iab_tsv_locked(path: str, sig: Tuple[int, int]) -> List[Dict]:
+	global _HEADERS_INFO
+	# Cold start: reuse the pickled result of an earlier parse of this exact TSV by this parser
+	side = _load_sidecar(path, sig)
+	if side is not None:
+		headers, codes = side
+		_HEADERS_INFO = (headers, path)
+		_PARSE_CACHE[path] = (sig, codes)
+		return codes
+
+	# Nodes are kept as parallel lists (struct-of-arrays) and referenced by index
+	uids: list[str] = []
+	parent_uids: list[str | None] = []
+	labels: list[str] = []
+	paths: list[list[str]] = []
+	levels = array("B")
 	headers: list[str] = []
-	with _open_text_sig(path) as f:
-		text = f.read()
-		lines = [ln for ln in text.splitlines() if ln is not None]
-		# Find actual header row (some files include a preamble line before the header)
-		header_idx = -1
-		for i, ln in enumerate(lines):
-			if ('Unique ID' in ln) and ('Parent' in ln) and ('Tier 1' in ln):
-				header_idx = i
+	# Parent index (parent uid -> child node indexes) is built in the same pass as the nodes
+	by_parent: defaultdict[str, list[int]] = defaultdict(list)
+	roots: list[int] = []
+	if os.path.getsize(path) == 0:
+		raise RuntimeError("[IAB] Could not find TSV header row (Unique ID / Parent / Tier 1)")
+	# Map the file instead of read()+splitlines(): lines are decoded one at a time from the page cache
+	with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+		# Find actual header row (some files include a preamble line before the header):
+		# memchr-style find() on the raw bytes, then widen each hit to its line
+		start = 0
+		while True:
+			hit = mm.find(b"Unique ID", start)
+			if hit == -1:
+				raise RuntimeError("[IAB] Could not find TSV header row (Unique ID / Parent / Tier 1)")
+			line_start = mm.rfind(b"\n", 0, hit) + 1
+			line_end = mm.find(b"\n", hit)
+			if line_end == -1:
+				line_end = len(mm)
+			raw = mm[line_start:line_end]
+			if b"Parent" in raw and b"Tier 1" in raw:
 				break
-		if header_idx == -1:
-			raise RuntimeError("[IAB] Could not find TSV header row (Unique ID / Parent / Tier 1)")
-		data_str = "\n".join(lines[header_idx:])
-		reader = csv.DictReader(io.StringIO(data_str), delimiter="\t")
-		headers = reader.fieldnames or []
-		global _HEADERS_INFO
+			start = line_end + 1
+		header_idx = mm[:line_start].count(b"\n")
+		headers = next(csv.reader([raw.decode("utf-8-sig").rstrip("\r")], delimiter="\t"), [])
 		_HEADERS_INFO = (headers, path)
-		# Header indices by name
-		def get(row: dict, key: str) -> str:
-			v = row.get(key)
-			return str(v).strip() if v is not None else ""
-		for row in reader:
-			uid = get(row, "Unique ID")
-			parent_uid = get(row, "Parent") or None
-			name = get(row, "Name")
+		# The fallback reader decodes the lines after the header lazily
+		body_start = min(line_end + 1, len(mm))
+		quoted = mm.find(b'"', body_start) != -1
+		mm.seek(body_start)
+		body = iter(mm.readline, b"")
+		columns = _read_tsv_columns(path, body, quoted, header_idx, headers, _PARSE_COLUMNS)
+		# Walk the parallel column lists by position instead of building a dict per row
+		for uid, parent_uid, name, *tiers in zip(*(columns[c] for c in _PARSE_COLUMNS)):
+			uid = (uid or "").strip()
+			parent_uid = (parent_uid or "").strip() or None
+			# Tier and name strings repeat across thousands of nodes; interning shares one object per value
+			name = sys.intern((name or "").strip())
 			# Build hierarchical path from tiers
-			tiers = [get(row, "Tier 1"), get(row, "Tier 2"), get(row, "Tier 3"), get(row, "Tier 4")]
-			path_names = [t for t in tiers if t]
+			path_names = [sys.intern(t) for t in ((t or "").strip() for t in tiers) if t]
 			label = name or (path_names[-1] if path_names else "")
 			if not uid or not label:
 				continue
 			if not path_names:
 				path_names = [label]
-			level = len(path_names) if path_names else 1
-			nodes.append({
-				"uid": uid,
-				"parent_uid": parent_uid,
-				"label": label,
-				"path": path_names,
-				"level": level,
-			})
-
-	# Index by parent
-	by_parent: dict[str, List[Dict]] = {}
-	roots: List[Dict] = []
-	for n in nodes:
-		key = n.get("parent_uid") or "__ROOT__"
-		lst = by_parent.get(key, [])
-		lst.append(n)
-		by_parent[key] = lst
-		if n.get("parent_uid") is None:
-			roots.append(n)
+			n = len(uids)
+			uids.append(uid)
+			parent_uids.append(parent_uid)
+			labels.append(label)
+			paths.append(path_names)
+			levels.append(len(path_names))
+			by_parent[parent_uid or "__ROOT__"].append(n)
+			if parent_uid is None:
+				roots.append(n)
 
 	# Sort siblings deterministically by label
-	for k, lst in list(by_parent.items()):
-		lst.sort(key=lambda a: a.get("label", "").lower())
-		by_parent[k] = lst
-	roots.sort(key=lambda a: a.get("label", "").lower())
+	sort_label = [label.lower() for label in labels].__getitem__
+	for lst in by_parent.values():
+		lst.sort(key=sort_label)
+	roots.sort(key=sort_label)
 
 	# Assign codes
 	code_by_uid: dict[str, str] = {}
-	top_rank_by_uid: dict[str, int] = {}
 
 	for i, root in enumerate(roots):
 		top = f"IAB{i+1}"
-		code_by_uid[root["uid"]] = top
-		top_rank_by_uid[root["uid"]] = i + 1
-		_assign_children(root["uid"], top, by_parent, code_by_uid, top_rank_by_uid, nodes)
-
-	# Build final list
-	codes: List[Dict] = []
-	for n in nodes:
-		uid = n["uid"]
-		code = code_by_uid.get(uid)
-		parent_uid = n.get("parent_uid")
-		parent_code = code_by_uid.get(parent_uid) if parent_uid else None
-		codes.append({
-			"code": code,
-			"label": n["label"],
-			"path": n["path"],
-			"level": n["level"],
-			"parent": parent_code,
-		})
+		code_by_uid[uids[root]] = top
+		_assign_children(uids[root], i + 1, by_parent, uids, code_by_uid)
+
+	# Build final list; parent codes come from the same uid -> code map, never by re-splitting a code
+	code_of = code_by_uid.get
+	codes: List[Dict] = [
+		{
+			"code": code_of(uid),
+			"label": label,
+			"path": path_names,
+			"level": level,
+			"parent": code_of(parent_uid) if parent_uid else None,
+		}
+		for uid, parent_uid, label, path_names, level in zip(uids, parent_uids, labels, paths, levels)
+	]
 
 	if len(codes) < 200:
 		raise RuntimeError(f"[IAB] taxonomy too small ({len(codes)}) at {path}")
 
+	_PARSE_CACHE[path] = (sig, codes)
+	_write_sidecar(path, sig, headers, codes)
 	return codes
 
 
-def _assign_children(parent_uid: str, parent_code: str, by_parent: dict[str, List[Dict]], code_by_uid: dict[str, str], top_rank_by_uid: dict[str, int], nodes: List[Dict]):
-	kids = by_parent.get(parent_uid) or []
-	# Determine top rank for this subtree by climbing to root via parent links
-	uid_to_parent: dict[str, str | None] = {n["uid"]: n.get("parent_uid") for n in nodes}
-	def top_rank_of(uid: str) -> int:
-		p = uid
-		while True:
-			parent = uid_to_parent.get(p)
-			if not parent:
-				return top_rank_by_uid.get(p, 0)
-			p = parent
-	for idx, child in enumerate(kids):
-		top_rank = top_rank_of(parent_uid)
-		code = f"IAB{top_rank}-{idx+1}"
-		code_by_uid[child["uid"]] = code
-		top_rank_by_uid[child["uid"]] = top_rank
-		_assign_children(child["uid"], code, by_parent, code_by_uid, top_rank_by_uid, nodes)
+def _sidecar_path(path: str) -> str:
+	return path + ".pkl"
+
+
+def _load_sidecar(path: str, sig: Tuple[int, int]) -> Tuple[list[str], List[Dict]] | None:
+	"""(headers, codes) pickled by a previous parse_iab_tsv, or None if missing, stale or unreadable.
+
+	Stale means written for a different TSV (mtime_ns, size) or by a different _PARSER_VERSION.
+	"""
+	side = _sidecar_path(path)
+	try:
+		with open(side, "rb") as f:
+			stamp, headers, codes = pickle.load(f)
+		if stamp != (tuple(sig), _PARSER_VERSION):
+			return None
+		return headers, codes
+	except FileNotFoundError:
+		return None
+	except Exception as e:
+		log.warning("[IAB] Ignoring unreadable sidecar %s: %s", side, e)
+		return None
+
+
+def _write_sidecar(path: str, sig: Tuple[int, int], headers: list[str], codes: List[Dict]) -> None:
+	# Best effort: the data directory may be read-only in deployed images
+	side = _sidecar_path(path)
+	tmp = f"{side}.{os.getpid()}.tmp"
+	try:
+		with open(tmp, "wb") as f:
+			pickle.dump(((tuple(sig), _PARSER_VERSION), headers, codes), f, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp, side)
+	except OSError as e:
+		log.debug("[IAB] Could not write sidecar %s: %s", side, e)
+		try:
+			os.remove(tmp)
+		except OSError:
+			pass
+
+
+def _assign_children(parent_uid: str, top_rank: int, by_parent: dict[str, list[int]], uids: list[str], code_by_uid: dict[str, str]):
+	# top_rank is fixed for the whole subtree, so it is threaded down rather than recovered per child.
+	# Explicit stack instead of recursion: no per-node frames and no recursion-depth limit.
+	stack = [parent_uid]
+	while stack:
+		uid = stack.pop()
+		for idx, child in enumerate(by_parent.get(uid) or ()):
+			child_uid = uids[child]
+			code_by_uid[child_uid] = f"IAB{top_rank}-{idx+1}"
+			stack.append(child_uid)
 
 
 # Legacy/minimal loaders retained for compatibility elsewhere in the app
 
 def load_iab_taxonomy(tsv_path: str | None = None) -> List[Dict]:
 	"""Cached richer loader returning {code,name,path,level}. Prefer this at runtime."""
-	global _IAB_CACHE, _IAB_PATH, _HEADERS_INFO
 	path = tsv_path or _env_path()
-	if _IAB_CACHE and _IAB_PATH == path:
-		return _IAB_CACHE
+	# One dict lookup keyed by path, so a concurrent load for another path can't pair the wrong items with it
+	items = _IAB_CACHE.get(path)
+	if items is not None:
+		return items
+	# Serialize cold loads so concurrent first requests parse the TSV only once
+	with _IAB_LOCK:
+		items = _IAB_CACHE.get(path)
+		if items is not None:
+			return items
+		return _load_iab_taxonomy_locked(path)
+
+
+def clear_cache() -> None:
+	"""Drop every cached taxonomy and serialized response (e.g. between tests)."""
+	global _IAB_JSON, _IAB31_JSON, _HEADERS_INFO
+	with _IAB_LOCK:
+		_IAB_CACHE.clear()
+		_PARSE_CACHE.clear()
+		_IAB_JSON = None
+		_IAB31_JSON = None
+		_HEADERS_INFO = None
+
+
+def _code_key(code: str) -> tuple:
+	"""Sort key for IAB codes: "IAB12-3" -> (12, 3); non-numeric parts stay strings."""
+	core = code[3:] if code.startswith("IAB") else code
+	if not core:
+		return ()
+	parts = core.split("-")
+	# All-numeric codes (the normal case) convert in one C-level map() call
+	if all(p.isdecimal() for p in parts):
+		return tuple(map(int, parts))
+	# isdecimal() matches exactly what int() accepts here, without a try/except per part
+	return tuple(int(p) if p.isdecimal() else p for p in parts)
+
+
+def _load_iab_taxonomy_locked(path: str) -> List[Dict]:
+	# sort by code then name
+	# decorate-sort-undecorate: the key tuple is built in the same pass that shapes each item;
+	# the index breaks ties so dicts are never compared.
+	# The official Unique ID/Parent/Tier layout goes through parse_iab_tsv (and its caches), so both
+	# taxonomy shapes come from one parse; other column layouts use the variant-header reader.
+	try:
+		decorated = [
+			(_code_key(c["code"]), c["label"], i, {"code": c["code"], "name": c["label"], "path": c["path"], "level": c["level"]})
+			for i, c in enumerate(parse_iab_tsv(path))
+		]
+	except RuntimeError:
+		decorated = [(_code_key(r.get("code", "")), r["name"], i, r) for i, r in enumerate(_load_variant_tsv(path))]
+	decorated.sort()
+	items = [d[3] for d in decorated]
+	if len(_IAB_CACHE) >= _IAB_CACHE_MAX:
+		_IAB_CACHE.pop(next(iter(_IAB_CACHE)))  # evict the oldest path
+	_IAB_CACHE[path] = items
+	log.info("[IAB] Loaded %d categories from %s", len(items), path)
+	return items
+
+
+def _mapped_tsv_rows(mm: mmap.mmap) -> Iterator[list[str]]:
+	"""Rows of a memory-mapped TSV (header included), BOM stripped.
+
+	Lines are split on tabs straight from the mapping; files containing a quote
+	character go through csv.reader so quoted tabs/newlines keep their meaning.
+	"""
+	mm.seek(3 if mm[:3] == b"\xef\xbb\xbf" else 0)
+	lines = iter(mm.readline, b"")
+	if mm.find(b'"') != -1:
+		yield from csv.reader((raw.decode("utf-8") for raw in lines), delimiter="\t")
+		return
+	for raw in lines:
+		yield raw.rstrip(b"\r\n").decode("utf-8").split("\t")
+
+
+def _load_variant_tsv(path: str) -> List[Dict]:
+	"""{code,name,path,level} rows from TSVs using the CODE/NAME/TIER header variants."""
+	global _HEADERS_INFO
 	items: List[Dict] = []
-	with _open_text_sig(path) as f:
-		reader = csv.DictReader(f, delimiter="\t")
-		headers = reader.fieldnames or []
+	with open(path, "rb") as f:
+		if os.fstat(f.fileno()).st_size == 0:
+			raise RuntimeError(f"[IAB] taxonomy too small (0) at {path}")
+		mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	with mm:
+		reader = _mapped_tsv_rows(mm)
+		headers = next(reader, [])
 		_HEADERS_INFO = (headers, path)
+		# Resolve candidate columns once instead of probing every field name per row
+		code_idx, name_idx, tier_idx = _variant_columns(tuple(headers))
 		for row in reader:
-			code = _pick_first(row, CODE_FIELDS) or ""
-			name = _pick_first(row, NAME_FIELDS)
+			code = _first_cell(row, code_idx) or ""
+			name = _first_cell(row, name_idx)
 			if not code and not name:
 				continue
 			# build path/level
 			tiers = []
-			for k in TIER_FIELDS:
-				v = row.get(k)
-				if v and str(v).strip():
-					txt = str(v).strip()
+			for i in tier_idx:
+				if i < len(row) and row[i].strip():
+					txt = row[i].strip()
 					if ">" in txt:
-						txt = txt.split(">")[-1].strip()
-					tiers.append(txt)
+						txt = txt.rpartition(">")[2].strip()
+					# Shared across every node under the same tier, so keep a single copy
+					tiers.append(sys.intern(txt))
 			if not name:
 				name = tiers[-1] if tiers else None
+			else:
+				name = sys.intern(name)
 			if not name:
 				continue
 			path_names = [t for t in tiers if t] or [name]
@@ -215,28 +474,37 @@ def load_iab_taxonomy(tsv_path: str | None = None) -> List[Dict]:
 			items.append({"code": code, "name": name, "path": path_names, "level": level or 1})
 	if len(items) < 100:
 		raise RuntimeError(f"[IAB] taxonomy too small ({len(items)}) at {path}")
-	# sort by code then name
-	def code_key(code: str):
-		core = code[3:] if code.startswith("IAB") else code
-		parts = []
-		for p in (core.split("-") if core else []):
-			try:
-				parts.append(int(p))
-			except ValueError:
-				parts.append(p)
-		return tuple(parts)
-	items.sort(key=lambda r: (code_key(r.get("code", "")), r["name"]))
-	_IAB_CACHE = items
-	_IAB_PATH = path
-	log.info("[IAB] Loaded %d categories from %s", len(items), path)
 	return items
 
 
+def _taxonomy_json(items: List[Dict]) -> Tuple[bytes, str]:
+	"""Serialized taxonomy and its ETag, rebuilt only when load_iab_taxonomy hands back a new list."""
+	global _IAB_JSON
+	cached = _IAB_JSON
+	if cached is None or cached[0] is not items:
+		body = to_json(items)
+		cached = (items, body, hashlib.blake2b(body, digest_size=8).hexdigest())
+		_IAB_JSON = cached
+	return cached[1], cached[2]
+
+
+def _conditional(etag: str, build) -> Response:
+	"""304 when the client already holds `etag`, otherwise the response from build()."""
+	if request.if_none_match.contains(etag):
+		resp = Response(status=304)
+	else:
+		resp = build()
+	resp.set_etag(etag)
+	resp.cache_control.public = True
+	resp.cache_control.max_age = _ETAG_MAX_AGE
+	return resp
+
+
 @bp.get("/taxonomy/iab3_1")
 @cross_origin()
 def get_taxonomy():
-	items = load_iab_taxonomy()
-	return jsonify(items)
+	body, etag = _taxonomy_json(load_iab_taxonomy())
+	return _conditional(etag, lambda: Response(body, mimetype="application/json"))
 
 
 @bp.get("/api/taxonomy/iab3_1")
@@ -250,7 +518,8 @@ def get_taxonomy_api():
 @cross_origin()
 def get_taxonomy_count():
 	items = load_iab_taxonomy()
-	return jsonify({"count": len(items)})
+	_, etag = _taxonomy_json(items)
+	return _conditional(f"{etag}-count", lambda: jsonify({"count": len(items)}))
 
 
 @bp.get("/api/taxonomy/iab3_1/debug")
@@ -258,40 +527,49 @@ def get_taxonomy_count():
 def taxonomy_debug():
 	items = load_iab_taxonomy()
 	headers, path = _HEADERS_INFO if _HEADERS_INFO else ([], _DEFAULT_PATH)
-	return jsonify({
+	_, etag = _taxonomy_json(items)
+	# headers/path are part of the payload, so fold them into the tag as well
+	meta = hashlib.blake2b(_json.dumps([headers, path]).encode("utf-8"), digest_size=4).hexdigest()
+	return _conditional(f"{etag}-debug-{meta}", lambda: jsonify({
 		"headers": headers,
 		"tsv_path": path,
 		"count": len(items),
 		"sample": items[:10],
-	})
+	}))
 
 
 def _natural_key(code: str):
-	parts = re.split(r'(\d+)', code or '')
-	nk = []
-	for p in parts:
-		nk.append(int(p) if p.isdigit() else p)
-	return nk
+	return [int(p) if p.isdigit() else p for p in _NATKEY_RE.split(code or '')]
+
+
+def _sort_by_code(items: List[Dict]) -> List[Dict]:
+	"""Sort {code,name} items naturally by code, then name; each key is computed once."""
+	decorated = [(_natural_key(it['code']), it['name'], i, it) for i, it in enumerate(items)]
+	decorated.sort()
+	return [d[3] for d in decorated]
 
 
 def normalize_code(code: str) -> str:
-	code = (code or '').strip()
-	code = code.replace('–', '-').replace('—', '-')
-	code = re.sub(r'\s+', '', code)
-	return code.upper()
+	if not code:
+		return ''
+	return code.translate(_NORM_TABLE).upper()
 
 
 def load_tsv_items(tsv_path: str) -> List[Dict]:
 	items: List[Dict] = []
 	with _open_text_sig(tsv_path) as f:
 		reader = csv.DictReader(f, delimiter='\t')
+		# Probe only the header variants this file actually has, usually one per category
+		fields = set(reader.fieldnames or [])
+		code_keys = [k for k in CODE_FIELDS if k in fields]
+		name_keys = [k for k in NAME_FIELDS if k in fields]
 		for row in reader:
-			code = normalize_code(_pick_first(row, CODE_FIELDS) or '')
-			name = _pick_first(row, NAME_FIELDS) or code
+			code = normalize_code(_pick_first(row, code_keys) or '')
+			name = _pick_first(row, name_keys) or code
 			if not code and not name:
 				continue
 			items.append({"code": code, "name": name})
-	items.sort(key=lambda x: (_natural_key(x["code"]), x["name"]))
+	items = _sort_by_code(items)
 	return items
 
 
@@ -301,10 +579,11 @@ def load_bundle_map(bundle_json_path: str) -> Dict[str, str]:
 			data = json.load(f)
 		# Accept either list or dict
 		if isinstance(data, dict):
-			return {normalize_code(k): v for k, v in data.items()}
+			# Interned keys let the loaders' lookups with interned codes short-circuit on identity
+			return {sys.intern(normalize_code(k)): v for k, v in data.items()}
 		m: Dict[str, str] = {}
 		for row in data:
-			c = normalize_code(row.get('code', ''))
+			c = sys.intern(normalize_code(row.get('code', '')))
 			if not c:
 				continue
 			m[c] = row.get('name') or row.get('label') or row.get('title') or c
@@ -332,30 +611,39 @@ def load_iab_from_firestore(bundle_map: Dict[str, str]) -> List[Dict]:
 		db = fs.client()
 		collections = os.getenv('IAB_COLLECTIONS', 'pages,articles,content,urls,documents').split(',')
 		fields = os.getenv('IAB_CODE_FIELDS', 'iab_codes,iab_content_codes,iab,iab_categories,taxonomy.iab,categories.iab').split(',')
+		fields = [f.strip() for f in fields if f.strip()]
+		paths = [f.split('.') for f in fields]
 		seen = set()
 		for coll in [c.strip() for c in collections if c.strip()]:
-			for doc in db.collection(coll).limit(10000).stream():
+			# Project to the code fields only (select() takes dotted paths for nested maps too)
+			for doc in db.collection(coll).select(fields).limit(10000).stream():
 				data = doc.to_dict() or {}
-				for field in [f.strip() for f in fields if f.strip()]:
-					path = field.split('.')
+				for path in paths:
 					val = _get_in(data, path)
 					if isinstance(val, list):
-						vals = val
+						for c in val:
+							if isinstance(c, str) and c.strip():
+								seen.add(sys.intern(normalize_code(c)))
 					elif isinstance(val, str):
-						vals = re.split(r'[\s,;]+', val)
-					else:
-						vals = []
-					for c in vals:
-						if isinstance(c, str) and c.strip():
-							seen.add(normalize_code(c))
+						# Tokens come out already non-empty and separator-free
+						for c in _CODE_TOKEN_RE.findall(val):
+							seen.add(sys.intern(normalize_code(c)))
 		items = [{"code": c, "name": bundle_map.get(c, c)} for c in seen if c]
-		items.sort(key=lambda x: (_natural_key(x['code']), x['name']))
+		items = _sort_by_code(items)
 		return items
 	except Exception as e:
 		logging.exception("load_iab_from_firestore failed: %s", e)
 		return []
 
 
+# (table, column, subquery) sources of IAB codes for load_iab_from_postgres
+_PG_CODE_SOURCES = [
+	("content_categories", "iab_code", "SELECT iab_code FROM content_categories WHERE iab_code IS NOT NULL"),
+	("content", "iab_codes", "SELECT unnest(iab_codes) AS iab_code FROM content WHERE iab_codes IS NOT NULL"),
+	("content", "iab", "SELECT jsonb_array_elements_text(iab->'codes') AS iab_code FROM content WHERE iab ? 'codes'"),
+]
+
+
 def load_iab_from_postgres(bundle_map: Dict[str, str]) -> List[Dict]:
 	try:
 		import psycopg
@@ -363,23 +651,28 @@ def load_iab_from_postgres(bundle_map: Dict[str, str]) -> List[Dict]:
 		if not dsn:
 			return []
 		seen = set()
-		queries = [
-			"SELECT DISTINCT iab_code FROM content_categories WHERE iab_code IS NOT NULL",
-			"SELECT DISTINCT unnest(iab_codes) AS iab_code FROM content WHERE iab_codes IS NOT NULL",
-			"SELECT DISTINCT jsonb_array_elements_text(iab->'codes') AS iab_code FROM content WHERE iab ? 'codes'",
-		]
 		with psycopg.connect(dsn) as conn:
 			with conn.cursor() as cur:
-				for q in queries:
-					try:
-						cur.execute(q)
-						for (c,) in cur:
-							if c:
-								seen.add(normalize_code(c))
-					except Exception:
-						continue
+				# Only union the sources whose table/column exists, so one missing table can't fail the whole query
+				cur.execute(
+					"SELECT table_name, column_name FROM information_schema.columns "
+					"WHERE table_schema = ANY(current_schemas(false)) AND table_name = ANY(%s)",
+					(list({t for t, _, _ in _PG_CODE_SOURCES}),),
+				)
+				present = set(cur.fetchall())
+				parts = [q for t, col, q in _PG_CODE_SOURCES if (t, col) in present]
+				if parts:
+					# One round-trip and one server-side dedup instead of a DISTINCT query per source
+					cur.execute(
+						"SELECT DISTINCT iab_code FROM ("
+						+ " UNION ALL ".join(f"({q})" for q in parts)
+						+ ") s WHERE iab_code IS NOT NULL"
+					)
+					for (c,) in cur:
+						if c:
+							seen.add(sys.intern(normalize_code(c)))
 		items = [{"code": c, "name": bundle_map.get(c, c)} for c in seen if c]
-		items.sort(key=lambda x: (_natural_key(x['code']), x['name']))
+		items = _sort_by_code(items)
 		return items
 	except Exception:
 		return []
@@ -406,25 +699,22 @@ def _load_contentive_json(json_path: str) -> List[Dict]:
 		raise ValueError('Invalid Contentive taxonomy JSON structure')
 	if len(codes) < 50:
 		raise ValueError(f'Contentive taxonomy too small: {len(codes)} at {json_path}')
-	items: List[Dict] = []
+	# dedupe by code while building (first occurrence wins; blank codes are dropped)
+	seen: Dict[str, Dict] = {}
 	for c in codes:
-		code = c.get('code') or c.get('iab_code') or c.get('uid')
+		code = str(c.get('code') or c.get('iab_code') or c.get('uid') or '').strip()
+		if not code or code in seen:
+			continue
 		label = c.get('label') or c.get('name') or code
 		path = c.get('path') or c.get('iab_path') or []
-		sensitive = bool(c.get('sensitive', False))
-		items.append({
-			'code': str(code or '').strip(),
-			'name': str(label or '').strip(),
-			'path': path if isinstance(path, list) else [],
+		seen[code] = {
+			'code': code,
+			# Names and tier labels repeat across many entries (json.load gives each its own copy); codes don't
+			'name': sys.intern(str(label or '').strip()),
+			'path': [sys.intern(t) if isinstance(t, str) else t for t in path] if isinstance(path, list) else [],
 			'iab_code': c.get('iab_code'),
-			'sensitive': sensitive,
-		})
-	# dedupe by code
-	seen: Dict[str, Dict] = {}
-	for it in items:
-		k = it.get('code')
-		if k and k not in seen:
-			seen[k] = it
+			'sensitive': bool(c.get('sensitive', False)),
+		}
 	result = list(seen.values())
 	if len(result) < 50:
 		raise ValueError(f'Contentive taxonomy too small after normalization: {len(result)}')
@@ -478,6 +768,15 @@ def api_iab31():
         if not os.path.exists(json_path):
             json_path = '/opt/render/project/src/frontend/src/data/iab_content_taxonomy_3_1.v1.json'
         
+        # Serve the already-built body until the JSON file changes
+        global _IAB31_JSON
+        st = os.stat(json_path)
+        sig = (st.st_mtime_ns, st.st_size)
+        cached = _IAB31_JSON
+        if cached is not None and cached[0] == json_path and cached[1] == sig:
+            body, etag = cached[2], cached[3]
+            return _conditional(etag, lambda: Response(body, mimetype='application/json'))
+
         print(f"[IAB API] Loading JSON from: {json_path}")
         
         with open(json_path, 'r', encoding='utf-8') as f:
@@ -518,7 +817,10 @@ def api_iab31():
             'codes': codes,
         }
 
-        return jsonify(payload)
+        body = to_json(payload)
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        _IAB31_JSON = (json_path, sig, body, etag)
+        return _conditional(etag, lambda: Response(body, mimetype='application/json'))
         
     except FileNotFoundError as e:
         print(f"[IAB API] JSON file not found: {e}")
@@ -529,4 +831,4 @@ def api_iab31():
     except Exception as e:
         print(f"[IAB API] Unexpected error: {e}")
         return jsonify({'error': str(e)}), 500
-__all__ = ["parse_iab_tsv", "load_iab_taxonomy"]
+__all__ = ["parse_iab_tsv", "load_iab_taxonomy", "clear_cache"]
@@ -1,8 +1,16 @@
 import os
 import json
+import hashlib
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from collections import OrderedDict
+from itertools import chain
 from datetime import datetime, timedelta
 from datetime import timezone
-from urllib.parse import urlparse
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS, cross_origin
 from newspaper import Article
@@ -11,35 +19,98 @@ import requests
 from openai import OpenAI
 from firebase_service import get_firebase_service
 import firebase_admin
-from firebase_admin import auth
+from firebase_admin import auth, firestore
 from merge_attribution_with_classification import merge_attribution_data
 from taxonomy_loader import load_taxonomy, TaxonomyLoadError
-from exporter import to_csv, to_json
+from exporter import iter_quoted_csv, to_csv, to_json
 from iab_taxonomy import bp as iab_bp, load_iab_taxonomy
 from iab_taxonomy import load_tsv_items, load_bundle_map, load_iab_from_db, MIN_FULL_TAXONOMY
 from iab_taxonomy import get_taxonomy_codes
 from iab_taxonomy import parse_iab_tsv
 from typing import Optional
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional accelerator; Flask's stdlib provider is the fallback
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:  # optional; falls back to the ~4 characters per token estimate
+    tiktoken = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # optional C parser; BeautifulSoup is the fallback
+    HTMLParser = None
+
+try:
+    import trafilatura
+except ImportError:  # optional extractor; newspaper3k/BeautifulSoup are the fallback
+    trafilatura = None
+
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson.
+
+    Datetimes are passed through to Flask's default hook so they keep the same
+    HTTP-date format jsonify produced before.
+    """
+
+    def _dumps_bytes(self, obj, sort_keys, indent):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps_bytes(obj, kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # jsonify() path: hand orjson's UTF-8 bytes straight to the response instead of
+        # decoding to str and letting the response object encode it again.
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self._dumps_bytes(obj, self.sort_keys, indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def _json_bytes(obj) -> bytes:
+    """Serialize `obj` with the app's JSON provider (orjson when installed) as UTF-8 bytes."""
+    provider = app.json
+    if isinstance(provider, OrjsonProvider):
+        return provider._dumps_bytes(obj, provider.sort_keys, False)
+    return provider.dumps(obj).encode('utf-8')
+
 
 # Initialize Flask app
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 CORS(app)
 app.register_blueprint(iab_bp)
 
-# Load taxonomy at startup and stash in config
-try:
-	IAB = load_iab_taxonomy(os.getenv('IAB_TSV_PATH'))
-	app.config['IAB_TAXONOMY'] = IAB
-	print(f"[IAB] Loaded {len(IAB)} categories from TSV")
-except Exception as e:
-	print(f"[IAB] Failed to load taxonomy: {e}")
-
-# Attempt new deterministic IAB 3.1 load for Segment Builder
+# Parse the IAB 3.1 TSV once at startup to warm parse_iab_tsv's cache for the
+# Segment Builder; the /taxonomy/iab3_1 category view is derived from the same parse.
+# (The classifier's IAB_TAXONOMY mapping is loaded from JSON further below.)
 try:
 	codes = parse_iab_tsv(os.getenv('IAB_TSV_PATH'))
 	print(f"[IAB] Loaded {len(codes)} codes from backend")
 except Exception as e:
 	print(f"[IAB] Backend IAB 3.1 not ready: {e}")
+try:
+	IAB = load_iab_taxonomy(os.getenv('IAB_TSV_PATH'))
+	print(f"[IAB] Loaded {len(IAB)} categories from TSV")
+except Exception as e:
+	print(f"[IAB] Failed to load taxonomy: {e}")
 
 # Initialize Firebase Admin SDK on startup
 print("🚀 Initializing Firebase Admin SDK on app startup...")
@@ -55,9 +126,17 @@ except Exception as e:
 
 # Set up OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+CLASSIFICATION_MODEL = "gpt-4"
 MAX_TOKENS = 3500
-
-# Enhanced prompt with specific content analysis and better examples
+BULK_CLASSIFY_WORKERS = int(os.getenv("BULK_CLASSIFY_WORKERS", "16"))
+# Articles per OpenAI request in /classify-bulk; 1 keeps one request per URL
+BULK_CLASSIFY_BATCH_SIZE = int(os.getenv("BULK_CLASSIFY_BATCH_SIZE", "1"))
+
+# Enhanced prompt with specific content analysis and better examples.
+# Always sent as the first message and must stay byte-stable (no dates, URLs or
+# other per-request substitutions): it is hashed into the result-cache key, and
+# models with prompt caching can reuse it as a prefix. Article text belongs in the
+# user message only.
 SYSTEM_PROMPT = """
 You are an expert content classification engine. Analyze the article content carefully and classify it using the official IAB Tech Lab Content Taxonomy 3.1.
 
@@ -185,9 +264,55 @@ def _taxonomy_summary():
     }
 
 
+# Seconds clients may reuse a taxonomy response before revalidating with If-None-Match
+_TAXONOMY_MAX_AGE = 300
+
+
+def _taxonomy_response(body: bytes, etag: str) -> Response:
+    """JSON `body` tagged with `etag`, or an empty 304 when the client already holds it."""
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = _TAXONOMY_MAX_AGE
+    return resp
+
+
 @app.route('/taxonomy', methods=['GET'])
 def taxonomy_health():
-    return jsonify(_taxonomy_summary())
+    body = jsonify(_taxonomy_summary()).get_data()
+    return _taxonomy_response(body, hashlib.sha1(body).hexdigest())
+
+
+def _code_sort_key(code: str) -> tuple:
+    """Numeric sort key for an IAB code: 'IAB12-3' -> (12, 3); non-numeric parts sort as -1."""
+    out = []
+    for i, s in enumerate(code.split('-')):
+        if i == 0:
+            s = s.replace('IAB', '')
+        try:
+            out.append(int(s))
+        except Exception:
+            out.append(-1)
+    return tuple(out)
+
+
+def _sorted_code_items(tax: dict) -> list:
+    """Taxonomy codes as {code,name,path,level} rows in numeric code order, built once per taxonomy."""
+    items = tax.get('_sorted_codes')
+    if items is not None:
+        return items
+    # decorate-sort-undecorate: one key per code; the index keeps equal keys in load order
+    decorated = [
+        (_code_sort_key(c), i, {'code': c, 'name': v.get('label'), 'path': v.get('path'), 'level': v.get('level')})
+        for i, (c, v) in enumerate(tax.get('codes', {}).items())
+    ]
+    decorated.sort()
+    items = [d[2] for d in decorated]
+    tax['_sorted_codes'] = items
+    return items
 
 
 @app.route('/taxonomy/codes', methods=['GET'])
@@ -195,24 +320,17 @@ def taxonomy_health():
 def taxonomy_codes():
     tax = app.config.get('IAB_TAXONOMY') or {}
     codes = tax.get('codes', {})
-    arr = []
-    for c, v in codes.items():
-        arr.append({'code': c, 'name': v.get('label'), 'path': v.get('path'), 'level': v.get('level')})
-    # sort numerically by IAB code parts
-    def parts(code: str):
-        segs = code.split('-')
-        out = []
-        for i, s in enumerate(segs):
-            if i == 0:
-                s = s.replace('IAB', '')
-            try:
-                out.append(int(s))
-            except Exception:
-                out.append(-1)
-        return out
-    arr.sort(key=lambda item: parts(item['code']))
-    app.logger.info('Serving taxonomy codes count=%d', len(arr))
-    return jsonify({'version': tax.get('version', '3.1'), 'source': tax.get('source'), 'commit': tax.get('commit'), 'codes': arr})
+    # The serialized response and its ETag are built once per taxonomy and stored on it;
+    # refresh_taxonomy installs a new taxonomy dict, which drops it.
+    cached = tax.get('_codes_json')
+    if cached is None:
+        arr = _sorted_code_items(tax)
+        body = jsonify({'version': tax.get('version', '3.1'), 'source': tax.get('source'), 'commit': tax.get('commit'), 'codes': arr}).get_data()
+        # Content hash rather than tax['commit']: JSON-loaded taxonomies are all 'unversioned'
+        cached = (body, hashlib.sha1(body).hexdigest())
+        tax['_codes_json'] = cached
+    app.logger.info('Serving taxonomy codes count=%d', len(codes))
+    return _taxonomy_response(*cached)
 
 @app.route('/api/taxonomy/codes', methods=['GET'])
 @cross_origin()
@@ -227,69 +345,97 @@ def refresh_taxonomy():
         _verify_and_get_user_id()
         global IAB_TAXONOMY_URL
         source = IAB_TAXONOMY_URL or IAB_LOCAL_FALLBACK_TSV
-        app.config['IAB_TAXONOMY'] = load_taxonomy(source, IAB_LOCAL_FALLBACK_JSON)
+        tax = load_taxonomy(source, IAB_LOCAL_FALLBACK_JSON)
+        _label_index(tax)
+        _sorted_code_items(tax)
+        app.config['IAB_TAXONOMY'] = tax
         return jsonify(_taxonomy_summary())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-def _normalize_and_validate_iab(result: dict) -> dict:
-    """Enhanced IAB code validation with improved error handling and logging."""
-    tax = app.config.get('IAB_TAXONOMY') or {}
-    code_map = tax.get('codes', {})
-    
-    # Build label-to-code mapping from corrected taxonomy
+def _label_index(tax: dict) -> dict:
+    """Label -> codes index, built once per taxonomy and stored on it as '_label_index'.
+
+    refresh_taxonomy installs a new taxonomy dict, so a stale index is never reused.
+    """
+    index = tax.get('_label_index')
+    if index is not None:
+        return index
     label_to_codes = {}
-    for code, info in code_map.items():
+    for code, info in tax.get('codes', {}).items():
         if info and 'label' in info:
             label_key = info['label'].strip().lower()
             if label_key not in label_to_codes:
                 label_to_codes[label_key] = []
             label_to_codes[label_key].append(code)
+    # Prefer root category over subcategory (IAB1 before IAB1-1), decided once per taxonomy
+    for candidates in label_to_codes.values():
+        candidates.sort(key=lambda x: (x.count('-'), x))
+    tax['_label_index'] = label_to_codes
+    return label_to_codes
 
-    def extract_iab_code(text: str) -> str:
-        """Extract clean IAB code from text like 'IAB18 (Style & Fashion)'."""
-        if not text:
-            return ''
-        text = text.strip()
-        # Extract IAB code pattern
-        import re
-        match = re.match(r'^(IAB\d+(?:-\d+)?)', text)
-        return match.group(1) if match else ''
-
-    def validate_iab_code(code: str, label_text: str = '') -> str:
-        """Validate and normalize IAB code with fallback to label mapping."""
-        # First try direct code validation
-        clean_code = extract_iab_code(code) if code else ''
-        if clean_code and clean_code in code_map:
-            return clean_code
-        
-        # Try extracting code from label text (e.g., "IAB18 (Style & Fashion)")
-        if label_text:
-            extracted = extract_iab_code(label_text)
-            if extracted and extracted in code_map:
-                return extracted
-        
-        # Try label-based lookup as fallback
-        if label_text:
-            # Clean label text - remove IAB code prefix if present
-            clean_label = re.sub(r'^IAB\d+(?:-\d+)?\s*\(([^)]+)\)', r'\1', label_text.strip())
-            label_key = clean_label.lower().strip()
-            
-            if label_key in label_to_codes:
-                # Prefer root category over subcategory for primary classification
-                candidates = label_to_codes[label_key]
-                # Sort by code complexity (IAB1 before IAB1-1)
-                candidates.sort(key=lambda x: (len(x.split('-')), x))
-                return candidates[0]
-        
+
+# Build the derived views of the startup taxonomy now rather than on the first request
+if isinstance(app.config.get('IAB_TAXONOMY'), dict):
+    _label_index(app.config['IAB_TAXONOMY'])
+    _sorted_code_items(app.config['IAB_TAXONOMY'])
+
+
+# Leading IAB code of a model-supplied value, e.g. 'IAB18' in 'IAB18 (Style & Fashion)'
+_IAB_CODE_PREFIX_RE = re.compile(r'IAB\d+(?:-\d+)?')
+# 'IAB18 (Style & Fashion)' -> label group 'Style & Fashion'
+_IAB_CODE_LABEL_RE = re.compile(r'IAB\d+(?:-\d+)?\s*\(([^)]+)\)')
+
+# (code field, label field) pairs in a classification result, in validation order
+_IAB_FIELD_PAIRS = (
+    ('iab_code', 'iab_category'),
+    ('iab_subcode', 'iab_subcategory'),
+    ('iab_secondary_code', 'iab_secondary_category'),
+    ('iab_secondary_subcode', 'iab_secondary_subcategory'),
+)
+
+
+def _extract_iab_code(text: str) -> str:
+    """Extract clean IAB code from text like 'IAB18 (Style & Fashion)'."""
+    if not text:
         return ''
+    match = _IAB_CODE_PREFIX_RE.match(text.strip())
+    return match.group(0) if match else ''
+
 
-    # Validate each IAB field
-    primary_code = validate_iab_code(result.get('iab_code'), result.get('iab_category'))
-    sub_code = validate_iab_code(result.get('iab_subcode'), result.get('iab_subcategory'))
-    sec_code = validate_iab_code(result.get('iab_secondary_code'), result.get('iab_secondary_category'))
-    sec_sub_code = validate_iab_code(result.get('iab_secondary_subcode'), result.get('iab_secondary_subcategory'))
+def _normalize_and_validate_iab(result: dict) -> dict:
+    """Enhanced IAB code validation with improved error handling and logging."""
+    tax = app.config.get('IAB_TAXONOMY') or {}
+    code_map = tax.get('codes', {})
+    label_to_codes = _label_index(tax)
+
+    # Validate all four (code, label) pairs in stages, so the usual case (the model
+    # returned valid codes) is settled by the first pass of direct lookups and only
+    # the misses fall through to label parsing and the label index.
+    pairs = [(result.get(code_field), result.get(label_field)) for code_field, label_field in _IAB_FIELD_PAIRS]
+    validated = [_extract_iab_code(code) if code else '' for code, _ in pairs]
+    validated = [c if c and c in code_map else '' for c in validated]
+
+    for i, (_, label_text) in enumerate(pairs):
+        if validated[i] or not label_text:
+            continue
+        # Code embedded in the label text (e.g., "IAB18 (Style & Fashion)")
+        extracted = _extract_iab_code(label_text)
+        if extracted and extracted in code_map:
+            validated[i] = extracted
+            continue
+        # Label-based lookup as fallback; drop any IAB code prefix first
+        clean_label = label_text.strip()
+        match = _IAB_CODE_LABEL_RE.match(clean_label)
+        if match:
+            clean_label = match.group(1) + clean_label[match.end():]
+        candidates = label_to_codes.get(clean_label.lower().strip())
+        if candidates:
+            # Already ordered root-first by _label_index
+            validated[i] = candidates[0]
+
+    primary_code, sub_code, sec_code, sec_sub_code = validated
 
     # Validate code relationships (subcategories should match parent)
     if sub_code and primary_code:
@@ -312,7 +458,7 @@ def _normalize_and_validate_iab(result: dict) -> dict:
         ('iab_subcode', result.get('iab_subcode')), 
         ('iab_subcategory', result.get('iab_subcategory'))
     ]:
-        if value and not any(extract_iab_code(str(value)) == vc for vc in valid_codes):
+        if value and _extract_iab_code(str(value)) not in valid_codes:
             invalid_inputs.append(f"{field}={value}")
     
     print(f"[taxonomy] version={tax.get('version')} valid_codes={len(valid_codes)} "
@@ -333,10 +479,13 @@ def _normalize_and_validate_iab(result: dict) -> dict:
 
     return result
 
+# scheme://host/path (scheme and '//' optional); query and fragment are left unmatched
+_URL_RE = re.compile(r'^(?:(?P<scheme>[A-Za-z][A-Za-z0-9+.\-]*):(?=//))?(?://)?(?P<host>[^/?#]*)(?P<path>[^?#]*)')
+
 def normalize_url(raw: str) -> str:
     """
     Robust URL normalization for consistent matching.
-    - If scheme-less (e.g., 'www.site.com/page'), prepend https:// and re-parse
+    - If scheme-less (e.g., 'www.site.com/page'), the first path segment is the host and https:// is assumed
     - Lowercase host; preserve original path case
     - Drop query and fragment
     - Trim trailing slash unless path == '/'
@@ -348,37 +497,22 @@ def normalize_url(raw: str) -> str:
       # assert normalize_url('www.site.com/page') == 'https://www.site.com/page'
       # assert normalize_url('SITE.com/Page/') == 'https://site.com/Page'
       # assert normalize_url('https://site.com') == 'https://site.com'
+      # assert normalize_url('site.com:8080/page') == 'https://site.com:8080/page'
     """
     try:
         if raw is None:
             return ''
-        s = raw.strip()
-        parsed = urlparse(s)
-        scheme = parsed.scheme.lower() if parsed.scheme else ''
-        netloc = parsed.netloc
-        path = parsed.path or ''
-
-        # Handle scheme-less inputs like 'www.site.com/page'
-        if not netloc and path and ('.' in path) and (' ' not in path):
-            # Split first segment as host
-            parts = path.split('/', 1)
-            host = parts[0]
-            rest_path = '/' + parts[1] if len(parts) > 1 else ''
-            netloc = host
-            path = rest_path
-            scheme = scheme or 'https'
-        else:
-            scheme = scheme or 'https'
-
-        # Normalize host casing
-        host_lower = (netloc or '').lower()
-        # Drop query/fragment
+        m = _URL_RE.match(raw.strip())
+        scheme = (m.group('scheme') or 'https').lower()
+        path = m.group('path')
+        semi = path.find(';', path.rfind('/')) if ';' in path else -1
+        if semi >= 0:
+            # Drop ;params on the last segment, as urllib.parse.urlparse does
+            path = path[:semi]
         # Keep original path case; remove trailing slash except root
         if path.endswith('/') and path != '/':
             path = path[:-1]
-
-        normalized = f"{scheme}://{host_lower}{path}"
-        return normalized
+        return f"{scheme}://{m.group('host').lower()}{path}"
     except Exception:
         return (raw or '').strip().lower()
 
@@ -392,6 +526,8 @@ def now_iso_utc() -> str:
 # -----------------------------------------------------------------------------
 
 _ADMIRAL_CACHE = {}
+# Keep-alive connection to the Admiral API, shared across requests
+_ADMIRAL_HTTP = requests.Session()
 
 def _get_client_ip() -> str:
     candidates = [
@@ -416,7 +552,7 @@ def _admiral_cache_get(key: str) -> Optional[str]:
         if not entry:
             return None
         expires, body = entry
-        if datetime.utcnow() < expires:
+        if datetime.now(timezone.utc) < expires:
             return body
         # expired
         _ADMIRAL_CACHE.pop(key, None)
@@ -426,7 +562,7 @@ def _admiral_cache_get(key: str) -> Optional[str]:
 
 def _admiral_cache_set(key: str, body: str, ttl_seconds: int) -> None:
     try:
-        _ADMIRAL_CACHE[key] = (datetime.utcnow() + timedelta(seconds=ttl_seconds), body)
+        _ADMIRAL_CACHE[key] = (datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds), body)
     except Exception:
         pass
 
@@ -462,7 +598,7 @@ def admiral_bootstrap():
         params['disableFeatures'] = disable_features
 
     try:
-        resp = requests.get(base, params=params, timeout=5)
+        resp = _ADMIRAL_HTTP.get(base, params=params, timeout=5)
         resp.raise_for_status()
         body = resp.text or ''
         # Cache for 6 hours as a safe default
@@ -475,31 +611,83 @@ def admiral_bootstrap():
         app.logger.warning('Admiral Install API fetch failed: %s', e)
         return Response('', status=204)
 
+# Verified Firebase ID tokens: token -> (cache expiry epoch seconds, decoded claims)
+_TOKEN_CACHE = OrderedDict()
+_TOKEN_CACHE_LOCK = threading.Lock()
+_TOKEN_CACHE_MAX = 4096
+_TOKEN_CACHE_TTL = 300
+
+def _verify_id_token_cached(token: str) -> dict:
+    """auth.verify_id_token with a short in-process cache.
+
+    A verified token is reused for up to _TOKEN_CACHE_TTL seconds and never past
+    its own 'exp' claim; failures are not cached, so they raise every time.
+    """
+    now = time.time()
+    # Keyed by digest so the cache holds fixed-size keys rather than the raw bearer tokens
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    with _TOKEN_CACHE_LOCK:
+        entry = _TOKEN_CACHE.get(key)
+        if entry is not None:
+            if now < entry[0]:
+                _TOKEN_CACHE.move_to_end(key)
+                return entry[1]
+            del _TOKEN_CACHE[key]
+    decoded_token = auth.verify_id_token(token)
+    expires = min(now + _TOKEN_CACHE_TTL, float(decoded_token.get('exp') or 0))
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[key] = (expires, decoded_token)
+        while len(_TOKEN_CACHE) > _TOKEN_CACHE_MAX:
+            _TOKEN_CACHE.popitem(last=False)
+    return decoded_token
+
 def _verify_and_get_user_id() -> str:
     auth_header = request.headers.get('Authorization')
     if not auth_header or not auth_header.startswith('Bearer '):
         raise PermissionError('Missing or invalid authorization header')
     token = auth_header.split('Bearer ')[1]
-    decoded_token = auth.verify_id_token(token)
+    decoded_token = _verify_id_token_cached(token)
     return decoded_token['uid']
 
-def _map_sort_param(sort_param: str) -> str:
-    sort_map = {
-        'click_through_rate': 'attribution_ctr',
-        'ctr': 'attribution_ctr',
-        'conversions': 'attribution_conversions',
-        'viewability': 'attribution_viewability',
-        'scroll_depth': 'attribution_scroll_depth',
-        'impressions': 'attribution_impressions',
-        'fill_rate': 'attribution_fill_rate',
-    }
-    return sort_map.get((sort_param or '').lower(), 'attribution_conversions')
+_SORT_FIELD_MAP = {
+    'click_through_rate': 'attribution_ctr',
+    'ctr': 'attribution_ctr',
+    'conversions': 'attribution_conversions',
+    'viewability': 'attribution_viewability',
+    'scroll_depth': 'attribution_scroll_depth',
+    'impressions': 'attribution_impressions',
+    'fill_rate': 'attribution_fill_rate',
+}
 
-def _extract_numeric(value, reverse: bool):
+@lru_cache(maxsize=32)
+def _map_sort_param(sort_param: str) -> str:
+    return _SORT_FIELD_MAP.get((sort_param or '').lower(), 'attribution_conversions')
+
+def _to_float(value):
+    """float(value), or None when it is missing or not numeric."""
+    # Firestore hands back int/float/None almost always; only strings need parsing
+    if type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    if value is None:
+        return None
     try:
         return float(value)
     except Exception:
+        return None
+
+def _extract_numeric(value, reverse: bool):
+    valf = _to_float(value)
+    if valf is None:
         return float('-inf') if reverse else float('inf')
+    return valf
+
+# Column order of the /export-activation and /segments/<id>/export CSV downloads
+ACTIVATION_CSV_HEADERS = [
+    'url', 'iab_code', 'iab_subcode', 'iab_secondary_code', 'iab_secondary_subcode',
+    'tone', 'intent', 'conversions', 'ctr', 'viewability', 'scroll_depth', 'impressions', 'fill_rate', 'last_updated'
+]
 
 def _activation_fields(record: dict) -> dict:
     return {
@@ -520,21 +708,123 @@ def _activation_fields(record: dict) -> dict:
         'merged_at': record.get('merged_at') or record.get('classification_timestamp') or record.get('uploaded_at'),
     }
 
+def _query_top_desc(query, field: str, limit: int, numeric: bool = True):
+    """The `limit` records of `query` with the highest `field`, ordered and cut by Firestore.
+
+    Returns None when the page comes back short: Firestore leaves out documents
+    that lack `field`, while the in-memory sort keeps them (last), so the caller
+    has to stream the full result set to include them. Only descending order is
+    pushed down; ascending would put Firestore's nulls first, where the
+    in-memory sort puts them last.
+
+    Firestore orders by value type before value, putting every string above every
+    number. For a `numeric` field the ordered page is therefore limited to numbers,
+    and string values (which _to_float may still parse) are returned alongside it;
+    the caller's _extract_numeric sort and cut rank them. Pass numeric=False for
+    fields stored as strings, such as the ISO `merged_at`.
+    """
+    ranked = query.where(field, '>=', float('-inf')) if numeric else query
+    docs = list(ranked.order_by(field, direction=firestore.Query.DESCENDING).limit(limit).stream())
+    if len(docs) < limit:
+        return None
+    records = [doc.to_dict() for doc in docs]
+    if numeric:
+        records.extend(doc.to_dict() for doc in query.where(field, '>=', '').stream())
+    return records
+
+# Max values in one Firestore 'in' filter
+_FIRESTORE_IN_LIMIT = 30
+
+def _query_iab_in(query, codes: list, fields: tuple = ('classification_iab_code', 'classification_iab_secondary_code')) -> list:
+    """Records from `query` where any of `fields` (by default the primary or secondary IAB code) is in `codes`.
+
+    Runs one 'in' query per field and per chunk of codes concurrently and
+    de-duplicates documents matched by more than one of them.
+    """
+    codes = list(dict.fromkeys(codes))
+    chunks = [codes[i:i + _FIRESTORE_IN_LIMIT] for i in range(0, len(codes), _FIRESTORE_IN_LIMIT)]
+    queries = [
+        query.where(field, 'in', chunk)
+        for field in fields
+        for chunk in chunks
+    ]
+    with ThreadPoolExecutor(max_workers=min(8, len(queries))) as ex:
+        results = list(ex.map(lambda q: list(q.stream()), queries))
+    by_id = {}
+    for docs in results:
+        for doc in docs:
+            by_id.setdefault(doc.id, doc)
+    return [doc.to_dict() for doc in by_id.values()]
+
+@lru_cache(maxsize=4096)
+def _iso_start(date_str: str) -> str:
+    """Inclusive lower bound for a YYYY-MM-DD day in the stored ISO-8601 UTC strings."""
+    return f"{date_str}T00:00:00Z"
+
+@lru_cache(maxsize=4096)
+def _iso_end(date_str: str) -> str:
+    """Inclusive upper bound for a YYYY-MM-DD day in the stored ISO-8601 UTC strings."""
+    return f"{date_str}T23:59:59Z"
+
+# Max concurrent Firestore queries a wide date range is split into
+_DATE_SHARDS = 8
+
+def _date_range_windows(start_str: str, end_str: str):
+    """Split [start 00:00:00Z, end 23:59:59Z] into up to _DATE_SHARDS contiguous (low, high, high_op) bounds.
+
+    Returns None for ranges of two days or less and for dates not in YYYY-MM-DD form.
+    """
+    try:
+        start = datetime.strptime(start_str, '%Y-%m-%d').date()
+        end = datetime.strptime(end_str, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+    # Shard bounds are built from isoformat(); only split when they compare like the inputs
+    if start.isoformat() != start_str or end.isoformat() != end_str:
+        return None
+    days = (end - start).days + 1
+    if days <= 2:
+        return None
+    shards = min(_DATE_SHARDS, days)
+    lows = [_iso_start((start + timedelta(days=days * i // shards)).isoformat()) for i in range(shards)]
+    windows = [(lo, hi, '<') for lo, hi in zip(lows, lows[1:])]
+    windows.append((lows[-1], _iso_end(end_str), '<='))
+    return windows
+
+def _stream_date_range(query, field: str, start_str: str, end_str: str) -> list:
+    """Records of `query` whose `field` lies between start_str 00:00:00Z and end_str 23:59:59Z.
+
+    Either bound may be empty. Wide ranges are read as concurrent date shards so
+    the Firestore round trips overlap; the result order is unspecified.
+    """
+    windows = _date_range_windows(start_str, end_str) if start_str and end_str else None
+    if windows is None:
+        q = query
+        if start_str:
+            q = q.where(field, '>=', _iso_start(start_str))
+        if end_str:
+            q = q.where(field, '<=', _iso_end(end_str))
+        return [doc.to_dict() for doc in q.stream()]
+
+    def run(window):
+        low, high, high_op = window
+        return [doc.to_dict() for doc in query.where(field, '>=', low).where(field, high_op, high).stream()]
+
+    with ThreadPoolExecutor(max_workers=len(windows)) as ex:
+        return [r for records in ex.map(run, windows) for r in records]
+
 def _fetch_merged_with_filters(start_str: str, end_str: str, include_iab: list, exclude_iab: list, sort_param: str, order: str, limit: int) -> list:
     firebase_service = get_firebase_service()
     coll = firebase_service.db.collection('merged_content_signals')
 
     # Date range defaults
-    now = datetime.utcnow()
+    now = datetime.now(timezone.utc)
     if not start_str and not end_str:
         start_str = (now - timedelta(days=30)).strftime('%Y-%m-%d')
         end_str = now.strftime('%Y-%m-%d')
 
-    def to_iso_bounds(date_str: str, is_start: bool) -> str:
-        return f"{date_str}T00:00:00Z" if is_start else f"{date_str}T23:59:59Z"
-
-    start_iso = to_iso_bounds(start_str, True) if start_str else None
-    end_iso = to_iso_bounds(end_str, False) if end_str else None
+    start_iso = _iso_start(start_str) if start_str else None
+    end_iso = _iso_end(end_str) if end_str else None
 
     query = coll
     if start_iso:
@@ -542,27 +832,44 @@ def _fetch_merged_with_filters(start_str: str, end_str: str, include_iab: list,
     if end_iso:
         query = query.where('upload_date', '<=', end_iso)
 
-    docs = query.stream()
-    records = [doc.to_dict() for doc in docs]
+    field = _map_sort_param(sort_param)
+    reverse = (order or 'desc').lower() != 'asc'
+
+    records = None
+    if include_iab:
+        # Let Firestore return only the matching codes instead of the whole date range
+        try:
+            records = _query_iab_in(query, include_iab)
+        except Exception as e:
+            app.logger.warning('IAB include filter query failed, filtering in memory: %s', e)
+    elif reverse and not exclude_iab and limit > 0:
+        # No in-memory filter can drop rows, so Firestore can order and cap the read
+        try:
+            records = _query_top_desc(query, field, limit)
+        except Exception as e:
+            app.logger.warning('Ordered query on %s failed, sorting in memory: %s', field, e)
+    if records is None:
+        records = _stream_date_range(coll, 'upload_date', start_str, end_str)
+
+    # IAB include/exclude in-memory filtering (exclude always runs here; include re-checks pushed-down results)
+    inc = frozenset(include_iab)
+    exc = frozenset(exclude_iab)
 
-    # IAB include/exclude in-memory filtering
     def matches_iab(rec: dict) -> bool:
         primary = (rec.get('classification_iab_code') or '')
         secondary = (rec.get('classification_iab_secondary_code') or '')
-        if include_iab:
-            if not (primary in include_iab or secondary in include_iab):
+        if inc:
+            if not (primary in inc or secondary in inc):
                 return False
-        if exclude_iab:
-            if primary in exclude_iab or secondary in exclude_iab:
+        if exc:
+            if primary in exc or secondary in exc:
                 return False
         return True
 
     if include_iab or exclude_iab:
         records = [r for r in records if matches_iab(r)]
 
-    # Sort
-    field = _map_sort_param(sort_param)
-    reverse = (order or 'desc').lower() != 'asc'
+    # Sort (also settles ties and non-numeric values for server-ordered pages)
     records.sort(key=lambda r: _extract_numeric(r.get(field), reverse), reverse=reverse)
     return records[:limit]
 
@@ -603,7 +910,7 @@ def get_merged_data():
 
         token = auth_header.split('Bearer ')[1]
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = _verify_id_token_cached(token)
             user_id = decoded_token['uid']
         except Exception as e:
             print(f"Token verification failed: {e}")
@@ -617,62 +924,37 @@ def get_merged_data():
         fallback = request.args.get('fallback', '0') == '1'
         limit = int(request.args.get('limit', 200))
 
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         if not start_str and not end_str:
             # Default: last 30 days by merged_at
             default_start = (now - timedelta(days=30)).strftime('%Y-%m-%d')
             default_end = now.strftime('%Y-%m-%d')
             start_str, end_str = default_start, default_end
 
-        def to_iso_bounds(date_str: str, is_start: bool) -> str:
-            return f"{date_str}T00:00:00Z" if is_start else f"{date_str}T23:59:59Z"
-
-        start_iso = to_iso_bounds(start_str, True) if start_str else None
-        end_iso = to_iso_bounds(end_str, False) if end_str else None
-
         firebase_service = get_firebase_service()
         coll = firebase_service.db.collection('merged_content_signals')
 
-        def run_query(with_filter: bool):
-            q = coll
-            if with_filter:
-                if start_iso:
-                    q = q.where('merged_at', '>=', start_iso)
-                if end_iso:
-                    q = q.where('merged_at', '<=', end_iso)
-            docs = q.stream()
-            records = [d.to_dict() for d in docs]
-            return records
-
         try:
-            results = run_query(with_filter=True)
+            results = _stream_date_range(coll, 'merged_at', start_str, end_str)
             if not results and fallback:
                 # fallback to latest N by merged_at
-                q = coll
-                docs = q.stream()
-                all_records = [d.to_dict() for d in docs]
-                all_records.sort(key=lambda r: r.get('merged_at', ''), reverse=True)
-                results = all_records[:limit]
+                results = None
+                if limit > 0:
+                    try:
+                        results = _query_top_desc(coll, 'merged_at', limit, numeric=False)
+                    except Exception as e:
+                        print(f"Ordered merged_at query failed, sorting in memory: {e}")
+                if results is None:
+                    q = coll
+                    docs = q.stream()
+                    all_records = [d.to_dict() for d in docs]
+                    all_records.sort(key=lambda r: r.get('merged_at', ''), reverse=True)
+                    results = all_records[:limit]
 
             # Server-side sorting by KPI
-            sort_map = {
-                'click_through_rate': 'attribution_ctr',
-                'conversions': 'attribution_conversions',
-                'viewability': 'attribution_viewability',
-                'scroll_depth': 'attribution_scroll_depth',
-                'impressions': 'attribution_impressions',
-                'fill_rate': 'attribution_fill_rate',
-            }
-            sort_field = sort_map.get(sort_param or 'conversions', 'attribution_conversions')
+            sort_field = _map_sort_param(sort_param)
             reverse = (order != 'asc')
-
-            def extract_numeric(v):
-                try:
-                    return float(v)
-                except Exception:
-                    return float('-inf') if reverse else float('inf')
-
-            results.sort(key=lambda r: extract_numeric(r.get(sort_field)), reverse=reverse)
+            results.sort(key=lambda r: _extract_numeric(r.get(sort_field), reverse), reverse=reverse)
 
             print(f"/merged-data: returned {len(results)} records, start={start_str}, end={end_str}, fallback={fallback}")
             return jsonify({ "results": results, "total_count": len(results) })
@@ -710,24 +992,9 @@ def export_activation():
                 'rows': rows,
                 'count': len(rows)
             })
-        # CSV
-        headers = [
-            'url', 'iab_code', 'iab_subcode', 'iab_secondary_code', 'iab_secondary_subcode',
-            'tone', 'intent', 'conversions', 'ctr', 'viewability', 'scroll_depth', 'impressions', 'fill_rate', 'last_updated'
-        ]
-        def to_csv_line(values):
-            def esc(v):
-                s = '' if v is None else str(v)
-                s = s.replace('"', '""')
-                return f'"{s}"'
-            return ','.join(esc(v) for v in values)
-
-        csv_lines = [','.join(headers)]
-        for row in rows:
-            csv_lines.append(to_csv_line([row.get(h) for h in headers]))
-        csv_data = '\n'.join(csv_lines)
-        return Response(csv_data, mimetype='text/csv', headers={
-            'Content-Disposition': f'attachment; filename=activation_export_{datetime.utcnow().date().isoformat()}.csv'
+        # CSV, streamed line by line
+        return Response(iter_quoted_csv(ACTIVATION_CSV_HEADERS, rows), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename=activation_export_{datetime.now(timezone.utc).date().isoformat()}.csv'
         })
     except PermissionError as pe:
         return jsonify({'error': str(pe)}), 401
@@ -749,30 +1016,35 @@ def _rules_to_params(rules: dict):
     kpi_filters = rules.get('kpi_filters') or {}
     return start, end, include_iab, exclude_iab, sort_by, order, kpi_filters
 
+_KPI_FIELD_MAP = {
+    'ctr': 'attribution_ctr',
+    'viewability': 'attribution_viewability',
+    'scroll_depth': 'attribution_scroll_depth',
+    'conversions': 'attribution_conversions',
+    'impressions': 'attribution_impressions',
+    'fill_rate': 'attribution_fill_rate',
+}
+
 def _apply_kpi_filters(records: list, kpi_filters: dict) -> list:
-    field_map = {
-        'ctr': 'attribution_ctr',
-        'viewability': 'attribution_viewability',
-        'scroll_depth': 'attribution_scroll_depth',
-        'conversions': 'attribution_conversions',
-        'impressions': 'attribution_impressions',
-        'fill_rate': 'attribution_fill_rate',
-    }
+    # Resolve field names and thresholds once rather than per record
+    bounds = []
+    for k, cond in kpi_filters.items():
+        field = _KPI_FIELD_MAP.get(k)
+        if not field:
+            continue
+        lo = float(cond['gte']) if 'gte' in cond else None
+        hi = float(cond['lte']) if 'lte' in cond else None
+        bounds.append((field, lo, hi))
+    if not bounds:
+        return list(records)
     def pass_filters(r: dict) -> bool:
-        for k, cond in kpi_filters.items():
-            field = field_map.get(k)
-            if not field:
-                continue
-            val = r.get(field)
-            try:
-                valf = float(val) if val is not None else None
-            except Exception:
-                valf = None
+        for field, lo, hi in bounds:
+            valf = _to_float(r.get(field))
             if valf is None:
                 return False
-            if 'gte' in cond and not (valf >= float(cond['gte'])):
+            if lo is not None and not (valf >= lo):
                 return False
-            if 'lte' in cond and not (valf <= float(cond['lte'])):
+            if hi is not None and not (valf <= hi):
                 return False
         return True
     return [r for r in records if pass_filters(r)]
@@ -787,7 +1059,7 @@ def create_segment():
         rules = payload.get('rules') or {}
         if not name:
             return jsonify({'error': 'name is required'}), 400
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         doc = {
             'name': name,
             'owner_uid': user_id,
@@ -811,12 +1083,22 @@ def list_segments():
         user_id = _verify_and_get_user_id()
         db = get_firebase_service().db
         docs = db.collection('segments').where('owner_uid', '==', user_id).stream()
-        segments = []
-        for d in docs:
-            data = d.to_dict()
-            data['id'] = d.id
-            segments.append(data)
-        return jsonify({'segments': segments, 'count': len(segments)})
+        # Pull the first document here so query errors still surface as a 500 below
+        first = next(docs, None)
+        docs = chain((first,), docs) if first is not None else ()
+
+        def generate():
+            # Stream {"segments": [...], "count": n} one serialized document at a time
+            count = 0
+            yield b'{"segments":['
+            for d in docs:
+                data = d.to_dict()
+                data['id'] = d.id
+                yield (b',' if count else b'') + _json_bytes(data)
+                count += 1
+            yield b'],"count":%d}\n' % count
+
+        return Response(generate(), mimetype='application/json')
     except PermissionError as pe:
         return jsonify({'error': str(pe)}), 401
     except Exception as e:
@@ -868,22 +1150,8 @@ def export_segment(seg_id):
         print(f"/segments/{seg_id}/export -> rows={len(rows)} format={fmt}")
         if fmt == 'json':
             return jsonify({'rows': rows, 'count': len(rows)})
-        headers = [
-            'url', 'iab_code', 'iab_subcode', 'iab_secondary_code', 'iab_secondary_subcode',
-            'tone', 'intent', 'conversions', 'ctr', 'viewability', 'scroll_depth', 'impressions', 'fill_rate', 'last_updated'
-        ]
-        def to_csv_line(values):
-            def esc(v):
-                s = '' if v is None else str(v)
-                s = s.replace('"', '""')
-                return f'"{s}"'
-            return ','.join(esc(v) for v in values)
-        csv_lines = [','.join(headers)]
-        for row in rows:
-            csv_lines.append(to_csv_line([row.get(h) for h in headers]))
-        csv_data = '\n'.join(csv_lines)
-        return Response(csv_data, mimetype='text/csv', headers={
-            'Content-Disposition': f'attachment; filename=segment_{seg_id}_export_{datetime.utcnow().date().isoformat()}.csv'
+        return Response(iter_quoted_csv(ACTIVATION_CSV_HEADERS, rows), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename=segment_{seg_id}_export_{datetime.now(timezone.utc).date().isoformat()}.csv'
         })
     except PermissionError as pe:
         return jsonify({'error': str(pe)}), 401
@@ -891,6 +1159,18 @@ def export_segment(seg_id):
         print(f"Error exporting segment: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Column order (and raw field names) of the /export-segment CSV download
+SEGMENT_CSV_HEADERS = [
+    'url', 'classification_iab_code', 'classification_iab_subcode',
+    'classification_iab_secondary_code', 'classification_iab_secondary_subcode',
+    'classification_tone', 'classification_intent',
+    'attribution_conversions', 'attribution_ctr', 'attribution_viewability',
+    'attribution_scroll_depth', 'attribution_impressions', 'attribution_fill_rate', 'merged_at'
+]
+# Fields /export-segment matches include/exclude codes against (classification_* first, legacy names as fallback)
+_SEGMENT_CODE_FIELDS = ('classification_iab_code', 'classification_iab_subcode', 'iab_code', 'iab_subcode')
+_SEGMENT_FETCH_FIELDS = list(dict.fromkeys(SEGMENT_CSV_HEADERS + list(_SEGMENT_CODE_FIELDS)))
+
 @app.route('/export-segment', methods=['POST'])
 def export_segment_min():
     try:
@@ -899,7 +1179,7 @@ def export_segment_min():
         if not auth_header or not auth_header.startswith('Bearer '):
             return jsonify({'error': 'Missing or invalid authorization header'}), 403
         token = auth_header.split('Bearer ')[1]
-        auth.verify_id_token(token)
+        _verify_id_token_cached(token)
 
         data = request.get_json(force=True) or {}
         seg_id = data.get('segmentId')
@@ -910,11 +1190,18 @@ def export_segment_min():
         if not seg_id and not (include_codes or exclude_codes or filters):
             return jsonify({'error': 'Provide segmentId or include/exclude codes/filters'}), 400
 
-        # Load rows using existing merged-data path (fallback to latest N)
         firebase_service = get_firebase_service()
-        coll = firebase_service.db.collection('merged_content_signals')
-        docs = coll.stream()
-        rows = [d.to_dict() for d in docs]
+        # Only the export columns and the legacy code fields row_has_code falls back to
+        query = firebase_service.db.collection('merged_content_signals').select(_SEGMENT_FETCH_FIELDS)
+        rows = None
+        if include_codes:
+            # Let Firestore return candidate rows only; row_has_code below keeps the exact semantics
+            try:
+                rows = _query_iab_in(query, include_codes, fields=_SEGMENT_CODE_FIELDS)
+            except Exception as e:
+                app.logger.warning('Segment include query failed, filtering in memory: %s', e)
+        if rows is None:
+            rows = [d.to_dict() for d in query.stream()]
 
         def row_has_code(row, codes):
             if not codes: return True
@@ -932,27 +1219,22 @@ def export_segment_min():
         if not rows:
             return jsonify({'error': 'No rows match the selection'}), 400
 
-        # Build CSV from activation fields similar to /export-activation
-        headers = [
-            'url', 'classification_iab_code', 'classification_iab_subcode',
-            'classification_iab_secondary_code', 'classification_iab_secondary_subcode',
-            'classification_tone', 'classification_intent',
-            'attribution_conversions','attribution_ctr','attribution_viewability',
-            'attribution_scroll_depth','attribution_impressions','attribution_fill_rate','merged_at'
-        ]
-        def esc(v):
-            s = '' if v is None else str(v)
-            return '"' + s.replace('"','""') + '"'
-        lines = [','.join(headers)]
-        for r in rows:
-            lines.append(','.join(esc(r.get(h)) for h in headers))
-        csv_text = '\n'.join(lines)
-        return Response(csv_text, mimetype='text/csv')
+        # CSV of the activation fields similar to /export-activation, streamed line by line
+        return Response(iter_quoted_csv(SEGMENT_CSV_HEADERS, rows), mimetype='text/csv')
     except Exception as e:
         import traceback
         print('export-segment error:', e, traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+def _count_query(query) -> int:
+    """Number of documents matching `query`, computed server-side by an aggregation query."""
+    try:
+        # One RPC returning an integer instead of every matching document (google-cloud-firestore >= 2.11)
+        return int(query.count().get()[0][0].value)
+    except AttributeError:
+        # Older client without aggregation support: count the streamed documents
+        return sum(1 for _ in query.stream())
+
 @app.route('/counts', methods=['GET'])
 def get_counts():
     """Return per-uid counts across collections with optional date filters (start/end).
@@ -962,10 +1244,8 @@ def get_counts():
         user_id = _verify_and_get_user_id()
         start_str = request.args.get('start')
         end_str = request.args.get('end')
-        def to_iso_bounds(date_str: str, is_start: bool) -> str:
-            return f"{date_str}T00:00:00Z" if is_start else f"{date_str}T23:59:59Z"
-        start_iso = to_iso_bounds(start_str, True) if start_str else None
-        end_iso = to_iso_bounds(end_str, False) if end_str else None
+        start_iso = _iso_start(start_str) if start_str else None
+        end_iso = _iso_end(end_str) if end_str else None
 
         db = get_firebase_service().db
 
@@ -975,11 +1255,9 @@ def get_counts():
             q_attr = q_attr.where('upload_date', '>=', start_iso)
         if end_iso:
             q_attr = q_attr.where('upload_date', '<=', end_iso)
-        attribution_count = sum(1 for _ in q_attr.stream())
 
         # Classified count (not always stored per uid reliably) — count total
-        q_cls = db.collection('classified_urls').stream()
-        classified_count = sum(1 for _ in q_cls)
+        q_cls = db.collection('classified_urls')
 
         # Merged count (uid may not be stored on all docs; filter by date on merged_at)
         q_mrg = db.collection('merged_content_signals')
@@ -987,7 +1265,10 @@ def get_counts():
             q_mrg = q_mrg.where('merged_at', '>=', start_iso)
         if end_iso:
             q_mrg = q_mrg.where('merged_at', '<=', end_iso)
-        merged_count = sum(1 for _ in q_mrg.stream())
+
+        # The three counts are independent; run them concurrently so the latency is the slowest one
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            attribution_count, classified_count, merged_count = ex.map(_count_query, (q_attr, q_cls, q_mrg))
 
         return jsonify({
             'attribution_count': attribution_count,
@@ -1016,7 +1297,7 @@ def test_auth():
         print(f"Test - Token extracted: {token[:20]}...")
         
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = _verify_id_token_cached(token)
             user_id = decoded_token['uid']
             email = decoded_token.get('email', 'No email')
             print(f"Test - Token verified successfully for user: {user_id} ({email})")
@@ -1049,7 +1330,7 @@ def classify():
         auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split('Bearer ')[1]
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = _verify_id_token_cached(token)
             user_id = decoded_token['uid']
             print(f"🔐 Authenticated user: {user_id}")
     except Exception as e:
@@ -1105,6 +1386,8 @@ def classify():
 def classify_bulk():
     data = request.json
     urls = data.get("urls", [])
+    if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+        return jsonify({"error": "'urls' must be a list of strings"}), 400
     force_reclassify = data.get("force_reclassify", False)  # New parameter
     results = []
 
@@ -1114,7 +1397,7 @@ def classify_bulk():
         auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split('Bearer ')[1]
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = _verify_id_token_cached(token)
             user_id = decoded_token['uid']
             print(f"🔐 Authenticated user for bulk classification: {user_id}")
     except Exception as e:
@@ -1123,21 +1406,53 @@ def classify_bulk():
 
     print(f"🚀 Starting bulk classification of {len(urls)} URLs (force_reclassify: {force_reclassify}, user_id: {user_id})")
 
-    successful_count = 0
-    for url in urls:
+    # Stored classifications for every URL in one batched get_all() read instead of a
+    # Firestore round-trip per URL; None (lookup failed) lets classify_url check per URL
+    unique_urls = list(dict.fromkeys(urls))
+    cache = None
+    if unique_urls and not force_reclassify:
         try:
-            result = classify_url(url, force_reclassify=force_reclassify, user_id=user_id)
+            cache = get_firebase_service().get_classifications_bulk(unique_urls)
+            print(f"📦 Prefetched {len(cache)}/{len(unique_urls)} stored classifications")
+        except Exception as e:
+            print(f"⚠️ Classification prefetch failed, checking per URL: {e}")
+
+    def _safe_classify(url):
+        try:
+            # The dashboard merge runs once for the whole request below
+            result = classify_url(url, force_reclassify=force_reclassify, user_id=user_id, merge=False, cache=cache)
             result["url"] = url
-            results.append(result)
-            successful_count += 1
-            print(f"✅ Completed {len(results)}/{len(urls)}: {url}")
+            print(f"✅ Completed: {url}")
+            return result
         except Exception as e:
-            error_result = {
+            print(f"❌ Failed: {url} - {str(e)}")
+            return {
                 "url": url,
                 "error": str(e)
             }
-            results.append(error_result)
-            print(f"❌ Failed {len(results)}/{len(urls)}: {url} - {str(e)}")
+
+    def _safe_classify_batch(batch):
+        try:
+            return classify_url_batch(batch, force_reclassify=force_reclassify, user_id=user_id, cache=cache)
+        except Exception as e:
+            print(f"❌ Failed batch of {len(batch)}: {str(e)}")
+            return [{"url": url, "error": str(e)} for url in batch]
+
+    # Each URL is an independent fetch + OpenAI round-trip, so run them concurrently;
+    # ex.map keeps results in request order. Repeated URLs are classified once.
+    if unique_urls and BULK_CLASSIFY_BATCH_SIZE > 1:
+        # Several articles per OpenAI request; classify_url_batch reports errors per URL
+        batches = [unique_urls[i:i + BULK_CLASSIFY_BATCH_SIZE] for i in range(0, len(unique_urls), BULK_CLASSIFY_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=min(BULK_CLASSIFY_WORKERS, len(batches))) as ex:
+            for batch_results in ex.map(_safe_classify_batch, batches):
+                results.extend(batch_results)
+    elif unique_urls:
+        with ThreadPoolExecutor(max_workers=min(BULK_CLASSIFY_WORKERS, len(unique_urls))) as ex:
+            results = list(ex.map(_safe_classify, unique_urls))
+    if len(unique_urls) < len(urls):
+        by_url = dict(zip(unique_urls, results))
+        results = [dict(by_url[url]) for url in urls]
+    successful_count = sum(1 for r in results if "error" not in r)
 
     print(f"🎯 Bulk classification complete: {successful_count}/{len(urls)} successful")
     
@@ -1145,6 +1460,9 @@ def classify_bulk():
     if user_id and successful_count > 0:
         try:
             print(f"🔄 Auto-triggering merge after bulk classification for user {user_id}")
+            # Classifications above were queued write-behind; the merge must see them
+            if not get_firebase_service().flush(unique_urls):
+                print("⚠️ Timed out waiting for queued classification writes before merge")
             from merge_attribution_with_classification import merge_attribution_data
             merge_result = merge_attribution_data(user_id=user_id)
             print(f"✅ Auto-merge completed: {merge_result.get('success', False)}")
@@ -1156,15 +1474,18 @@ def classify_bulk():
 
 @app.route("/recent-classifications", methods=["GET"])
 def get_recent_classifications():
-    """Get recent classifications from Firestore."""
+    """Get recent classifications from Firestore. Pass ?cursor=<next_cursor> for the next page."""
     try:
         limit = request.args.get("limit", 10, type=int)
         if limit > 100:  # Prevent excessive queries
             limit = 100
+        cursor = request.args.get("cursor")
             
         firebase_service = get_firebase_service()
-        results = firebase_service.get_recent_classifications(limit)
-        return jsonify({"results": results})
+        page = firebase_service.get_recent_classifications(limit, start_after=cursor)
+        return jsonify({"results": page["items"], "next_cursor": page["next_cursor"]})
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1184,7 +1505,7 @@ def upload_attribution():
         print(f"Token extracted: {token[:20]}...")
         
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = _verify_id_token_cached(token)
             user_id = decoded_token['uid']
             print(f"Token verified successfully for user: {user_id}")
         except Exception as e:
@@ -1192,40 +1513,42 @@ def upload_attribution():
             return jsonify({"error": "Invalid authentication token"}), 401
         
         # Get data from request
-        print(f"🔍 Raw request data: {request.get_data()}")
-        print(f"🔍 Request content type: {request.content_type}")
-        print(f"🔍 Request headers: {dict(request.headers)}")
+        debug = app.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            app.logger.debug("🔍 Request content type: %s, length: %s", request.content_type, request.content_length)
         
         data = request.json.get('data', [])
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
         print(f"📊 Received {len(data)} records from CSV upload")
-        if data:
-            print(f"📊 Sample record structure: {list(data[0].keys())}")
-            print(f"📊 Sample CTR value: '{data[0].get('ctr', 'NOT_FOUND')}' ({type(data[0].get('ctr'))})")
-            print(f"📊 Full first record for debugging: {data[0]}")
-            # Check for CTR column specifically
+        if debug:
+            # Upload shape debugging (LOG_LEVEL=DEBUG): first record and its CTR column
+            first_record = data[0]
+            app.logger.debug("📊 Sample record structure: %s", list(first_record.keys()))
+            app.logger.debug("📊 Full first record for debugging: %s", first_record)
             ctr_values = [record.get('ctr') for record in data[:5]]
-            print(f"🔍 First 5 CTR values: {ctr_values}")
-            print(f"🔍 CTR value types: {[type(v) for v in ctr_values]}")
-            
-            # Additional debugging - check if CTR column exists
-            if data:
-                first_record = data[0]
-                print(f"🔍 All keys in first record: {list(first_record.keys())}")
-                print(f"🔍 CTR key exists: {'ctr' in first_record}")
-                print(f"🔍 CTR key (case-insensitive): {[k for k in first_record.keys() if k.lower() == 'ctr']}")
-                print(f"🔍 Raw CTR value: {repr(first_record.get('ctr'))}")
-                print(f"🔍 Request JSON keys: {list(request.json.keys())}")
-                print(f"🔍 Request JSON data type: {type(request.json.get('data'))}")
-                print(f"🔍 Request JSON data length: {len(request.json.get('data', []))}")
+            app.logger.debug("🔍 First 5 CTR values: %s (types %s)", ctr_values, [type(v) for v in ctr_values])
+            app.logger.debug("🔍 CTR key (case-insensitive): %s", [k for k in first_record.keys() if k.lower() == 'ctr'])
         
         # Validate and save each record
         firebase_service = get_firebase_service()
         saved_count = 0
         classified_count = 0
         errors = []
+        attribution_records = []  # written together after the loop
+
+        # Stored classifications for every uploaded URL, read with batched get_all()
+        # calls up front instead of one Firestore round-trip per row
+        stored_classifications = {}
+        prefetched = True
+        try:
+            stored_classifications = firebase_service.get_classifications_bulk(
+                [(record.get('url') or '').strip() for record in data if isinstance(record, dict)]
+            )
+        except Exception as e:
+            print(f"⚠️ Classification prefetch failed, checking per row: {e}")
+            prefetched = False
         
         for i, record in enumerate(data):
             try:
@@ -1236,7 +1559,9 @@ def upload_attribution():
                     continue
                 
                 # Check if classification exists for this URL and user
-                existing_classification = firebase_service.get_classification_by_url(url)
+                existing_classification = stored_classifications.get(url)
+                if existing_classification is None and not prefetched:
+                    existing_classification = _stored_classification(firebase_service, url)
                 
                 # If no classification exists, classify the URL
                 if not existing_classification:
@@ -1256,6 +1581,8 @@ def upload_attribution():
                             
                             if firebase_service.save_classification(url, classification_data):
                                 classified_count += 1
+                                # Later rows for the same URL find it like a stored one
+                                stored_classifications[url] = classification_data
                                 print(f"Successfully auto-classified: {url}")
                             else:
                                 errors.append(f"Row {i+1}: Failed to save classification for: {url}")
@@ -1265,11 +1592,10 @@ def upload_attribution():
                         errors.append(f"Row {i+1}: Error classifying URL {url}: {str(e)}")
                 
                 # Prepare attribution data
-                # Debug CTR parsing
                 raw_ctr = record.get('ctr')
                 parsed_ctr = _parse_number(raw_ctr)
-                print(f"🔍 CTR Debug - URL: {url[:50]}... Raw CTR: {raw_ctr} ({type(raw_ctr)}), Parsed CTR: {parsed_ctr} ({type(parsed_ctr)})")
-                print(f"🔍 Full record for debugging: {record}")
+                if debug:
+                    app.logger.debug("🔍 CTR Debug - URL: %s... Raw CTR: %r, Parsed CTR: %r", url[:50], raw_ctr, parsed_ctr)
                 
                 # Determine upload_date: honor valid CSV value, else now
                 csv_upload_date = record.get('upload_date') or record.get('UploadDate') or record.get('uploaded_at')
@@ -1306,15 +1632,16 @@ def upload_attribution():
                     'fill_rate': _parse_number(record.get('fill_rate'))
                 }
                 
-                # Save to Firestore as a NEW document (versioned)
-                try:
-                    firebase_service.db.collection('attribution_data').add(attribution_data)
-                    saved_count += 1
-                except Exception as e:
-                    errors.append(f"Row {i+1}: Failed to save to database: {e}")
+                attribution_records.append(attribution_data)
                     
             except Exception as e:
                 errors.append(f"Row {i+1}: {str(e)}")
+
+        # Save to Firestore as NEW documents (versioned), 500 per batch commit instead of one RPC per row
+        if attribution_records:
+            saved_count = firebase_service.add_attributions_bulk(attribution_records)
+            if saved_count < len(attribution_records):
+                errors.append(f"Failed to save {len(attribution_records) - saved_count} of {len(attribution_records)} attribution records to database")
         
         # Auto-trigger merge process after successful upload
         merge_result = None
@@ -1347,23 +1674,20 @@ def upload_attribution():
 
 def _parse_number(value):
     """Parse a string value to number, return None if invalid."""
-    print(f"🔍 _parse_number called with: '{value}' ({type(value)})")
-    
+    # JSON uploads often carry numbers already
+    if isinstance(value, (int, float)):
+        return float(value)
+
     if value == '' or value is None:
-        print(f"  → Returning None (empty or None)")
         return None
     
     # Handle string "None" or "null" that might come from CSV
-    if isinstance(value, str) and value.lower() in ['none', 'null', 'nan']:
-        print(f"  → Returning None (string '{value}')")
+    if isinstance(value, str) and value.lower() in ('none', 'null', 'nan'):
         return None
     
     try:
-        result = float(value)
-        print(f"  → Successfully parsed to: {result} ({type(result)})")
-        return result
-    except (ValueError, TypeError) as e:
-        print(f"  → Parse failed with error: {e}")
+        return float(value)
+    except (ValueError, TypeError):
         return None
 
 @app.route("/merge-attribution", methods=["POST"])
@@ -1382,7 +1706,7 @@ def trigger_merge():
         print(f"Merge - Token extracted: {token[:20]}...")
         
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = _verify_id_token_cached(token)
             user_id = decoded_token['uid']
             print(f"Merge - Token verified successfully for user: {user_id}")
         except Exception as e:
@@ -1414,7 +1738,244 @@ def trigger_merge():
         print(f"Full traceback: {traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
 
-def classify_url(url, force_reclassify=False, user_id=None):
+# -----------------------------------------------------------------------------
+# Article extraction cache
+# Fetching and parsing dominate classify latency, and /classify-bulk often sees
+# the same URL more than once. Results are kept in a bounded in-process LRU;
+# failures are remembered briefly so broken URLs are not re-fetched in a loop.
+# -----------------------------------------------------------------------------
+
+_ARTICLE_CACHE = OrderedDict()
+_ARTICLE_CACHE_LOCK = threading.Lock()
+_ARTICLE_CACHE_MAX = int(os.getenv('ARTICLE_CACHE_MAX', '4096'))
+_ARTICLE_CACHE_TTL = int(os.getenv('ARTICLE_CACHE_TTL', '21600'))
+_ARTICLE_CACHE_ERROR_TTL = int(os.getenv('ARTICLE_CACHE_ERROR_TTL', '300'))
+
+_BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# One pooled session for article fetches so bulk runs reuse TCP/TLS connections
+_HTTP = requests.Session()
+_HTTP.headers.update(_BROWSER_HEADERS)
+_HTTP_ADAPTER = requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=32)
+_HTTP.mount('http://', _HTTP_ADAPTER)
+_HTTP.mount('https://', _HTTP_ADAPTER)
+
+def _extraction_error_message(url):
+    # Provide helpful error message based on URL
+    lowered = url.lower()
+    if 'linkedin.com' in lowered:
+        return "LinkedIn articles require login access. Please try a publicly accessible article URL."
+    if 'medium.com' in lowered:
+        return "Medium articles may be behind a paywall. Please try a free article URL."
+    if 'nytimes.com' in lowered or 'wsj.com' in lowered:
+        return "This news site requires subscription access. Please try a free news article URL."
+    return "Unable to extract content from this URL. The site may block automated access or require JavaScript rendering. Please try a different article URL."
+
+_BOILERPLATE_TAGS = ["script", "style", "nav", "header", "footer", "aside"]
+_CONTENT_SELECTORS = (
+    'article', '[role="main"]', '.content', '.post-content', 
+    '.entry-content', '.article-body', '.story-body', 'main',
+    '.post', '.article', '[class*="content"]', '[class*="article"]'
+)
+
+def _html_main_text(content):
+    """Main text of an HTML page via content selectors, then all <p> tags.
+
+    Uses selectolax's C parser when installed and BeautifulSoup otherwise.
+    Returns (article_text, extraction_method) or None.
+    """
+    if HTMLParser is not None:
+        tree = HTMLParser(content)
+        tree.strip_tags(_BOILERPLATE_TAGS)
+        for selector in _CONTENT_SELECTORS:
+            node = tree.css_first(selector)
+            if node is not None:
+                article_text = node.text(separator=' ', strip=True)
+                if len(article_text) > 100:
+                    print(f"✅ Successfully extracted {len(article_text)} characters using selector '{selector}'")
+                    return article_text, f"selectolax ({selector})"
+        texts = (node.text(strip=True) for node in tree.css("p"))
+        article_text = " ".join(t for t in texts if t)
+        if len(article_text) > 50:
+            print(f"✅ Successfully extracted {len(article_text)} characters from all paragraphs")
+            return article_text, "selectolax (paragraphs)"
+        return None
+
+    soup = BeautifulSoup(content, "html.parser")
+
+    # Remove script and style elements
+    for script in soup(_BOILERPLATE_TAGS):
+        script.decompose()
+
+    for selector in _CONTENT_SELECTORS:
+        content_elem = soup.select_one(selector)
+        if content_elem:
+            article_text = content_elem.get_text(separator=' ', strip=True)
+            if article_text and len(article_text) > 100:
+                print(f"✅ Successfully extracted {len(article_text)} characters using selector '{selector}'")
+                return article_text, f"BeautifulSoup ({selector})"
+
+    # Fallback to all paragraphs if selectors didn't work
+    texts = (p.get_text(strip=True) for p in soup.find_all("p"))
+    article_text = " ".join(t for t in texts if t)
+    if len(article_text) > 50:
+        print(f"✅ Successfully extracted {len(article_text)} characters from all paragraphs")
+        return article_text, "BeautifulSoup (paragraphs)"
+    return None
+
+def _extract_article_text(url):
+    """Download a page once and extract its article text.
+
+    The HTML is fetched through the shared session and then handed to
+    trafilatura (when installed), newspaper3k, the HTML content selectors and
+    finally a raw-text pass. Returns (article_text, extraction_method);
+    raises ValueError with a user-facing message when every method fails.
+    """
+    try:
+        print("Fetching article HTML...")
+        resp = _HTTP.get(url, timeout=15)
+    except Exception as e:
+        print(f"❌ Fetch failed: {e}")
+        raise ValueError(_extraction_error_message(url))
+
+    # Step 1: trafilatura / newspaper3k / content selectors need a successful page
+    if resp.ok:
+        html = resp.text
+
+        if trafilatura is not None:
+            try:
+                article_text = (trafilatura.extract(html, url=url) or '').strip()
+                if len(article_text) > 50:
+                    print(f"✅ Successfully extracted {len(article_text)} characters with trafilatura")
+                    return article_text, "trafilatura"
+            except Exception as e:
+                print(f"❌ trafilatura failed: {e}")
+
+        try:
+            print("Attempting to extract content with newspaper3k...")
+            article = Article(url)
+            article.download(input_html=html)
+            article.parse()
+            article_text = article.text.strip()
+            if article_text and len(article_text) > 50:  # Require meaningful content
+                print(f"✅ Successfully extracted {len(article_text)} characters with newspaper3k")
+                return article_text, "newspaper3k"
+            print("❌ newspaper3k: empty or insufficient article text")
+        except Exception as e:
+            print(f"❌ newspaper3k failed: {e}")
+
+        # Step 2: content selectors, then all paragraphs
+        try:
+            print("Attempting fallback with HTML content selectors...")
+            found = _html_main_text(resp.content)
+            if found:
+                return found
+            print("❌ No meaningful content found in paragraphs")
+        except Exception as e2:
+            print(f"❌ HTML content selectors also failed: {e2}")
+    else:
+        print(f"❌ Fetch returned HTTP {resp.status_code}")
+
+    # Step 3: Last resort - basic text extraction from whatever came back
+    try:
+        print("Attempting last resort text extraction...")
+        if HTMLParser is not None:
+            root = HTMLParser(resp.content).root
+            raw_text = root.text(separator=' ', strip=True) if root is not None else ''
+            method = "selectolax (raw text)"
+        else:
+            raw_text = BeautifulSoup(resp.content, "html.parser").get_text(separator=' ', strip=True)
+            method = "BeautifulSoup (raw text)"
+        # Clean up the text
+        lines = [line.strip() for line in raw_text.split('\n') if line.strip()]
+        article_text = ' '.join(lines)
+        if article_text and len(article_text) > 200:
+            print(f"✅ Last resort extracted {len(article_text)} characters")
+            return article_text, method
+    except Exception as e3:
+        print(f"❌ Last resort extraction failed: {e3}")
+
+    print("❌ All extraction methods failed")
+    raise ValueError(_extraction_error_message(url))
+
+_TOKEN_ENCODING = None
+
+def _truncate_to_tokens(text, max_tokens):
+    """Cut text to at most max_tokens model tokens (characters / 4 without tiktoken)."""
+    global _TOKEN_ENCODING
+    if tiktoken is None:
+        return text[:max_tokens * 4]
+    if len(text.encode('utf-8')) <= max_tokens:
+        return text  # a token never covers less than one byte
+    if _TOKEN_ENCODING is None:
+        _TOKEN_ENCODING = tiktoken.encoding_for_model(CLASSIFICATION_MODEL)
+    tokens = _TOKEN_ENCODING.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return _TOKEN_ENCODING.decode(tokens[:max_tokens])
+
+def _fetch_article_text(url, force_reclassify=False):
+    """Cached wrapper around _extract_article_text returning the truncated text.
+
+    force_reclassify skips the cached extraction and refreshes it with a new fetch.
+    """
+    now = datetime.now(timezone.utc)
+    with _ARTICLE_CACHE_LOCK:
+        entry = None if force_reclassify else _ARTICLE_CACHE.get(url)
+        if entry is not None:
+            if now < entry[0]:
+                _ARTICLE_CACHE.move_to_end(url)
+                ok, payload = entry[1], entry[2]
+                print(f"📄 Using cached article extraction for: {url}")
+                if ok:
+                    return payload
+                raise ValueError(payload)
+            del _ARTICLE_CACHE[url]
+
+    try:
+        article_text, extraction_method = _extract_article_text(url)
+    except ValueError as e:
+        entry = (now + timedelta(seconds=_ARTICLE_CACHE_ERROR_TTL), False, str(e))
+        _article_cache_put(url, entry)
+        raise
+
+    print(f"📄 Content extraction successful via {extraction_method}: {len(article_text)} characters")
+
+    article_text = _truncate_to_tokens(article_text, MAX_TOKENS)
+    _article_cache_put(url, (now + timedelta(seconds=_ARTICLE_CACHE_TTL), True, article_text))
+    return article_text
+
+def _article_cache_put(url, entry):
+    with _ARTICLE_CACHE_LOCK:
+        _ARTICLE_CACHE[url] = entry
+        _ARTICLE_CACHE.move_to_end(url)
+        while len(_ARTICLE_CACHE) > _ARTICLE_CACHE_MAX:
+            _ARTICLE_CACHE.popitem(last=False)
+
+def _stored_classification(firebase_service, url):
+    """Stored classification for one URL, or None if there is none or the read fails."""
+    if not firebase_service:
+        return None
+    try:
+        return firebase_service.get_classification_by_url(url)
+    except Exception as e:
+        print(f"Error checking cache: {e}")
+        return None
+
+
+def classify_url(url, force_reclassify=False, user_id=None, merge=True, cache=None):
+    """Classify one URL, reusing its stored classification unless force_reclassify.
+
+    `cache` is an optional url -> stored classification mapping prefetched by the
+    caller (see get_classifications_bulk); when given, it replaces the per-URL
+    Firestore lookup and URLs missing from it are treated as not yet classified.
+    """
     print(f"Starting classify_url function for: {url} (force_reclassify: {force_reclassify}, user_id: {user_id})")
     
     # Check OpenAI API key
@@ -1432,7 +1993,12 @@ def classify_url(url, force_reclassify=False, user_id=None):
         firebase_service = None
     
     # Check if URL has already been classified and stored in Firestore (unless force reclassify)
-    if firebase_service and not force_reclassify:
+    if cache is not None and not force_reclassify:
+        cached_result = cache.get(url)
+        if cached_result:
+            print(f"Returning cached classification for: {url}")
+            return dict(cached_result)
+    elif firebase_service and not force_reclassify:
         try:
             cached_result = firebase_service.get_classification_by_url(url)
             if cached_result:
@@ -1446,168 +2012,585 @@ def classify_url(url, force_reclassify=False, user_id=None):
     # If not cached, proceed with classification
     print(f"Classifying URL (not cached): {url}")
     
-    # Enhanced content extraction with multiple fallbacks
-    article_text = ""
-    extraction_method = ""
-    
-    # Step 1: Try newspaper3k with better headers
+    # Extraction (network fetch + parse) is cached per URL; see _fetch_article_text
+    article_text = _fetch_article_text(url, force_reclassify)
+
+    classification_result = classify_article_text(url, article_text, firebase_service, force_reclassify=force_reclassify)
+    return _store_classification(url, classification_result, firebase_service, user_id, merge=merge)
+
+
+# Every field the classification prompt asks for; filled with None when the model omits one
+CLASSIFICATION_FIELDS = (
+    'iab_category', 'iab_code', 'iab_subcategory', 'iab_subcode',
+    'iab_secondary_category', 'iab_secondary_code',
+    'iab_secondary_subcategory', 'iab_secondary_subcode',
+    'tone', 'intent', 'audience', 'keywords', 'buying_intent', 'ad_suggestions',
+)
+
+_loads_json = orjson.loads if orjson is not None else json.loads
+
+
+def _complete_classification(result):
+    """Ensure a parsed model reply is an object carrying every classification field."""
+    if not isinstance(result, dict):
+        raise TypeError(f"expected a JSON object, got {type(result).__name__}")
+    for field in CLASSIFICATION_FIELDS:
+        result.setdefault(field, None)
+    return result
+
+
+# Content-addressed result cache: (normalized URL, article text) -> validated classification.
+# In-process LRU with a TTL in front of the Firestore 'classifications_cache' collection,
+# so the same article classified for several users costs one OpenAI call.
+_RESULT_CACHE = OrderedDict()
+_RESULT_CACHE_LOCK = threading.Lock()
+_RESULT_CACHE_MAX = int(os.getenv('RESULT_CACHE_MAX', '10000'))
+_RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '86400'))
+_RESULT_CACHE_COLLECTION = 'classifications_cache'
+
+
+# Changes to the prompt or model must not reuse answers produced by the previous ones
+_CLASSIFIER_FINGERPRINT = hashlib.sha256((CLASSIFICATION_MODEL + '|' + SYSTEM_PROMPT).encode('utf-8')).hexdigest()
+
+
+def classification_cache_key(url, article_text):
+    parts = (_CLASSIFIER_FINGERPRINT, str(_taxonomy_version()), normalize_url(url), article_text)
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _taxonomy_version():
+    return (app.config.get('IAB_TAXONOMY') or {}).get('version', '3.1')
+
+
+def get_cached_classification(key, firebase_service=None):
+    """Return a copy of the cached classification for `key`, or None on a miss."""
+    now = time.monotonic()
+    with _RESULT_CACHE_LOCK:
+        entry = _RESULT_CACHE.get(key)
+        if entry is not None:
+            if now < entry[0]:
+                _RESULT_CACHE.move_to_end(key)
+                return dict(entry[1])
+            del _RESULT_CACHE[key]
+
+    if firebase_service is None:
+        return None
     try:
-        print("Attempting to extract content with newspaper3k...")
-        article = Article(url)
-        article.config.browser_user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        article.config.request_timeout = 15
-        article.download()
-        article.parse()
-        article_text = article.text.strip()
-        if article_text and len(article_text) > 50:  # Require meaningful content
-            print(f"✅ Successfully extracted {len(article_text)} characters with newspaper3k")
-            extraction_method = "newspaper3k"
-        else:
-            raise ValueError("Empty or insufficient article text from newspaper3k")
+        snapshot = firebase_service.db.collection(_RESULT_CACHE_COLLECTION).document(key).get()
     except Exception as e:
-        print(f"❌ newspaper3k failed: {e}")
-        
-        # Step 2: Enhanced BeautifulSoup with better headers and selectors
-        try:
-            print("Attempting fallback with enhanced BeautifulSoup...")
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-            }
-            resp = requests.get(url, timeout=15, headers=headers)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.content, "html.parser")
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-                script.decompose()
-            
-            # Try multiple content selectors
-            content_selectors = [
-                'article', '[role="main"]', '.content', '.post-content', 
-                '.entry-content', '.article-body', '.story-body', 'main',
-                '.post', '.article', '[class*="content"]', '[class*="article"]'
-            ]
-            
-            for selector in content_selectors:
-                content_elem = soup.select_one(selector)
-                if content_elem:
-                    article_text = content_elem.get_text(separator=' ', strip=True)
-                    if article_text and len(article_text) > 100:
-                        print(f"✅ Successfully extracted {len(article_text)} characters using selector '{selector}'")
-                        extraction_method = f"BeautifulSoup ({selector})"
-                        break
-            
-            # Fallback to all paragraphs if selectors didn't work
-            if not article_text or len(article_text) < 100:
-                paragraphs = soup.find_all("p")
-                article_text = " ".join(p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True))
-                if article_text and len(article_text) > 50:
-                    print(f"✅ Successfully extracted {len(article_text)} characters from all paragraphs")
-                    extraction_method = "BeautifulSoup (paragraphs)"
-                else:
-                    raise ValueError("No meaningful content found in paragraphs")
-                    
-        except Exception as e2:
-            print(f"❌ Enhanced BeautifulSoup also failed: {e2}")
-            
-            # Step 3: Last resort - try basic text extraction
-            try:
-                print("Attempting last resort text extraction...")
-                resp = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-                soup = BeautifulSoup(resp.content, "html.parser")
-                # Get all text, remove extra whitespace
-                raw_text = soup.get_text(separator=' ', strip=True)
-                # Clean up the text
-                lines = [line.strip() for line in raw_text.split('\n') if line.strip()]
-                article_text = ' '.join(lines)
-                
-                if article_text and len(article_text) > 200:
-                    print(f"✅ Last resort extracted {len(article_text)} characters")
-                    extraction_method = "BeautifulSoup (raw text)"
-                else:
-                    raise ValueError("Last resort extraction insufficient")
-                    
-            except Exception as e3:
-                print(f"❌ All extraction methods failed: {e3}")
-                # Provide helpful error message based on URL
-                if 'linkedin.com' in url.lower():
-                    error_msg = "LinkedIn articles require login access. Please try a publicly accessible article URL."
-                elif 'medium.com' in url.lower():
-                    error_msg = "Medium articles may be behind a paywall. Please try a free article URL."
-                elif 'nytimes.com' in url.lower() or 'wsj.com' in url.lower():
-                    error_msg = "This news site requires subscription access. Please try a free news article URL."
-                else:
-                    error_msg = f"Unable to extract content from this URL. The site may block automated access or require JavaScript rendering. Please try a different article URL."
-                
-                raise ValueError(error_msg)
-    
-    print(f"📄 Content extraction successful via {extraction_method}: {len(article_text)} characters")
+        print(f"Error reading classification cache: {e}")
+        return None
+    data = snapshot.to_dict() if snapshot.exists else None
+    # Validation depends on the taxonomy; entries from another version are misses
+    if not data or data.get('taxonomy_version') != _taxonomy_version() or not isinstance(data.get('result'), dict):
+        return None
+    _result_cache_put(key, data['result'])
+    return dict(data['result'])
+
+
+def put_cached_classification(key, url, result, firebase_service=None):
+    """Store a validated classification in the in-process cache and, if available, Firestore."""
+    _result_cache_put(key, result)
+    if firebase_service is None:
+        return
+    try:
+        firebase_service.db.collection(_RESULT_CACHE_COLLECTION).document(key).set({
+            'result': result,
+            'url_normalized': normalize_url(url),
+            'taxonomy_version': _taxonomy_version(),
+            'created_at': firebase_service._get_timestamp(),
+        })
+    except Exception as e:
+        print(f"Error writing classification cache: {e}")
+
+
+def _result_cache_put(key, result):
+    with _RESULT_CACHE_LOCK:
+        _RESULT_CACHE[key] = (time.monotonic() + _RESULT_CACHE_TTL, dict(result))
+        _RESULT_CACHE.move_to_end(key)
+        while len(_RESULT_CACHE) > _RESULT_CACHE_MAX:
+            _RESULT_CACHE.popitem(last=False)
+
+
+def classify_article_text(url, article_text, firebase_service=None, force_reclassify=False):
+    """Classify extracted article text, reusing a cached result for identical content.
+
+    force_reclassify skips the cache read (the fresh result still replaces the entry).
+    Returns the validated classification (not yet stored under the URL).
+    """
+    key = classification_cache_key(url, article_text)
+    if not force_reclassify:
+        cached = get_cached_classification(key, firebase_service)
+        if cached is not None:
+            print(f"Returning content-cached classification for: {url}")
+            return cached
 
-    if len(article_text) > MAX_TOKENS * 4:
-        article_text = article_text[:MAX_TOKENS * 4]
+    content = _request_classification(SYSTEM_PROMPT, _article_user_prompt(article_text))
 
-    user_prompt = f"""Here is the article text:
+    # Parse JSON safely
+    try:
+        classification_result = _complete_classification(_loads_json(content))
+    except (json.JSONDecodeError, TypeError):
+        raise ValueError("Failed to parse GPT response as valid JSON:\n" + content)
+    # Apply strict taxonomy validation/mapping
+    classification_result = _normalize_and_validate_iab(classification_result)
+    put_cached_classification(key, url, classification_result, firebase_service)
+    return classification_result
+
+
+def _article_user_prompt(article_text):
+    return f"""Here is the article text:
 
 \"\"\"{article_text}\"\"\""""
 
+
+class _JsonObjectEnd:
+    """Incrementally tracks brace depth (outside string literals) of a streamed JSON reply."""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume the next chunk; True once the first top-level object has closed."""
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.started
+            elif ch == '{':
+                self.depth += 1
+                self.started = True
+            elif ch == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+
+def _request_classification(system_prompt, user_prompt):
+    """Send one chat completion request and return the stripped message content."""
     print("Sending request to OpenAI API...")
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
+        stream = client.chat.completions.create(
+            model=CLASSIFICATION_MODEL,
             messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.4,
+            stream=True,
         )
         print("OpenAI API request successful")
-        content = response.choices[0].message.content.strip()
+        parts = []
+        try:
+            # Stop reading as soon as the top-level JSON object closes; anything the
+            # model would generate after it is discarded by json.loads anyway.
+            scanner = _JsonObjectEnd()
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                if scanner.feed(delta):
+                    break
+        finally:
+            stream.close()
+        content = ''.join(parts).strip()
         print(f"Received response from OpenAI: {len(content)} characters")
+        return content
     except Exception as e:
         print(f"OpenAI API request failed: {e}")
         raise ValueError(f"OpenAI API error: {e}")
 
-    # Parse JSON safely
+
+def _store_classification(url, classification_result, firebase_service, user_id, merge=True, as_of=None):
+    """Persist a validated classification to Firestore and optionally trigger the dashboard merge.
+
+    With `as_of` (when the article was fetched), the write is skipped if a newer
+    classification has been stored since, e.g. for Batch API results that arrive hours later.
+    Without a merge the write is queued for the background flusher (write-behind): it is
+    committed within FLUSH_INTERVAL_SECONDS, errors are only logged, and writes still queued
+    when the process is killed are lost. Callers that read it back must flush() its URL first.
+    """
+    if firebase_service:
+        try:
+            classification_result_with_meta = {
+                **classification_result,
+                'url_normalized': normalize_url(url),
+                'taxonomy_version': (app.config.get('IAB_TAXONOMY') or {}).get('version', '3.1'),
+                'user_id': user_id,  # Add user_id for dashboard integration
+                'timestamp': as_of or firebase_service._get_timestamp()
+            }
+            if as_of is not None:
+                if not firebase_service.save_if_newer(url, classification_result_with_meta):
+                    print(f"Classification for {url} not saved: a newer one is stored or the write failed")
+                    return classification_result
+            elif not merge:
+                firebase_service.enqueue_classification(url, classification_result_with_meta)
+                print(f"Queued classification for Firestore: {url} (user_id: {user_id})")
+                return classification_result
+            else:
+                # Synchronous: the merge below reads the document back
+                firebase_service.save_classification(url, classification_result_with_meta)
+            print(f"Successfully saved classification to Firestore for: {url} (user_id: {user_id})")
+
+            # If user is authenticated, trigger merge to make it appear in dashboard
+            if user_id and merge:
+                try:
+                    print(f"🔄 Auto-triggering merge after single classification for user {user_id}")
+                    from merge_attribution_with_classification import merge_attribution_data
+                    merge_result = merge_attribution_data(user_id=user_id)
+                    print(f"✅ Auto-merge completed: {merge_result.get('success', False)}")
+                except Exception as e:
+                    print(f"❌ Auto-merge failed (non-critical): {e}")
+                    # Don't fail the classification if merge fails
+
+        except Exception as e:
+            print(f"Failed to save classification to Firestore: {e}")
+
+    return classification_result
+
+
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+BATCH MODE: You will receive several articles, each introduced by a line "Article N:" and separated by "---".
+Classify each article independently. Return ONLY a JSON object of the form {"results": [...]}, where
+"results" holds exactly one classification object per article, in the same order, each in the JSON format above.
+"""
+
+
+def classify_url_batch(urls, force_reclassify=False, user_id=None, cache=None):
+    """Classify several URLs with a single OpenAI request.
+
+    Returns one dict per URL, in order; failed URLs carry an "error" key. Cached
+    results and extraction failures are resolved per URL before the request, and
+    any URL whose batched answer cannot be used is retried through classify_url.
+    The dashboard merge is left to the caller. `cache` is passed as in classify_url;
+    without it the stored classifications are read with one batched get_all().
+    """
+    openai_key = os.getenv("OPENAI_API_KEY")
+    if not openai_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+
     try:
-        classification_result = json.loads(content)
-        # Apply strict taxonomy validation/mapping
-        classification_result = _normalize_and_validate_iab(classification_result)
-        
-        # Store the result in Firestore if service is available
-        if firebase_service:
+        firebase_service = get_firebase_service()
+    except Exception as e:
+        print(f"Firebase service initialization failed: {e}")
+        firebase_service = None
+
+    if cache is None and firebase_service and not force_reclassify:
+        try:
+            cache = firebase_service.get_classifications_bulk(urls)
+        except Exception as e:
+            print(f"Error checking cache: {e}")
+
+    results = [None] * len(urls)
+    pending = []  # (index, url, article_text)
+    for i, url in enumerate(urls):
+        if force_reclassify:
+            stored = None
+        elif cache is not None:
+            stored = cache.get(url)
+        else:
+            # The batched read failed; look this URL up on its own
+            stored = _stored_classification(firebase_service, url)
+        if stored:
+            print(f"Returning cached classification for: {url}")
+            results[i] = {**stored, "url": url}
+            continue
+        try:
+            article_text = _fetch_article_text(url, force_reclassify)
+        except Exception as e:
+            results[i] = {"url": url, "error": str(e)}
+            continue
+        cached_result = None if force_reclassify else get_cached_classification(classification_cache_key(url, article_text), firebase_service)
+        if cached_result is not None:
             try:
-                classification_result_with_meta = {
-                    **classification_result,
-                    'url_normalized': normalize_url(url),
-                    'taxonomy_version': (app.config.get('IAB_TAXONOMY') or {}).get('version', '3.1'),
-                    'user_id': user_id,  # Add user_id for dashboard integration
-                    'timestamp': firebase_service._get_timestamp()
-                }
-                firebase_service.save_classification(url, classification_result_with_meta)
-                print(f"Successfully saved classification to Firestore for: {url} (user_id: {user_id})")
-                
-                # If user is authenticated, trigger merge to make it appear in dashboard
-                if user_id:
-                    try:
-                        print(f"🔄 Auto-triggering merge after single classification for user {user_id}")
-                        from merge_attribution_with_classification import merge_attribution_data
-                        merge_result = merge_attribution_data(user_id=user_id)
-                        print(f"✅ Auto-merge completed: {merge_result.get('success', False)}")
-                    except Exception as e:
-                        print(f"❌ Auto-merge failed (non-critical): {e}")
-                        # Don't fail the classification if merge fails
-                        
+                cached_result = _store_classification(url, cached_result, firebase_service, user_id, merge=False)
+                results[i] = {**cached_result, "url": url}
             except Exception as e:
-                print(f"Failed to save classification to Firestore: {e}")
-        
-        return classification_result
-        
-    except json.JSONDecodeError:
-        raise ValueError("Failed to parse GPT response as valid JSON:\n" + content)
+                results[i] = {"url": url, "error": str(e)}
+            continue
+        pending.append((i, url, article_text))
+
+    classified = []
+    if len(pending) > 1:
+        # Share the single-article prompt budget across the batch
+        budget = MAX_TOKENS // len(pending)
+        user_prompt = "\n---\n".join(
+            f'Article {n}:\n\"\"\"{_truncate_to_tokens(text, budget)}\"\"\"' for n, (_, _, text) in enumerate(pending, 1)
+        )
+        try:
+            content = _request_classification(BATCH_SYSTEM_PROMPT, user_prompt)
+            classified = _loads_json(content).get("results")
+            if not isinstance(classified, list) or len(classified) != len(pending):
+                print(f"⚠️ Batched response did not match {len(pending)} articles; falling back to per-URL")
+                classified = []
+        except (ValueError, AttributeError) as e:
+            print(f"⚠️ Batched classification failed, falling back to per-URL: {e}")
+            classified = []
+
+    for n, (i, url, article_text) in enumerate(pending):
+        try:
+            if n < len(classified) and isinstance(classified[n], dict):
+                result = _normalize_and_validate_iab(_complete_classification(classified[n]))
+                put_cached_classification(classification_cache_key(url, article_text), url, result, firebase_service)
+                result = _store_classification(url, result, firebase_service, user_id, merge=False)
+            else:
+                result = classify_url(url, force_reclassify=force_reclassify, user_id=user_id, merge=False, cache=cache)
+            results[i] = {**result, "url": url}
+        except Exception as e:
+            results[i] = {"url": url, "error": str(e)}
+    return results
+
+
+# -----------------------------------------------------------------------------
+# OpenAI Batch API classification
+# Large re-classification runs go through /v1/batches (half the token price,
+# separate rate limits, results within 24h). The sync path stays for the UI.
+# -----------------------------------------------------------------------------
+
+def _batch_custom_id(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:40]
+
+
+def submit_classification_batch(urls, user_id=None, force_reclassify=False):
+    """Extract article text for `urls` and submit one OpenAI batch of classification requests.
+
+    The custom_id -> URL mapping is stored in Firestore under
+    classification_batches/<batch_id> for reconcile_classification_batch.
+    Returns {"batch_id", "submitted", "cached", "errors"}.
+    """
+    firebase_service = get_firebase_service()
+    urls = list(dict.fromkeys(urls))
+
+    stored = {}
+    if not force_reclassify:
+        try:
+            stored = firebase_service.get_classifications_bulk(urls)
+        except Exception as e:
+            print(f"⚠️ Classification prefetch failed, checking per URL: {e}")
+            stored = None
+    cached, pending = [], []
+    for url in urls:
+        if stored.get(url) if stored is not None else _stored_classification(firebase_service, url):
+            cached.append(url)
+        else:
+            pending.append(url)
+
+    def _extract(url):
+        try:
+            return url, _fetch_article_text(url, force_reclassify), None
+        except Exception as e:
+            return url, None, str(e)
+
+    lines, url_by_id, errors = [], {}, []
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(BULK_CLASSIFY_WORKERS, len(pending))) as ex:
+            for url, article_text, error in ex.map(_extract, pending):
+                if error is not None:
+                    errors.append({"url": url, "error": error})
+                    continue
+                custom_id = _batch_custom_id(url)
+                url_by_id[custom_id] = url
+                lines.append(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": CLASSIFICATION_MODEL,
+                        "messages": [
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": _article_user_prompt(article_text)}
+                        ],
+                        "temperature": 0.4,
+                    },
+                }, ensure_ascii=False))
+
+    if not lines:
+        return {"batch_id": None, "submitted": 0, "cached": cached, "errors": errors}
+
+    batch_file = client.files.create(file=("classification_batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    firebase_service.db.collection('classification_batches').document(batch.id).set({
+        'user_id': user_id,
+        'urls': url_by_id,
+        'status': batch.status,
+        'reconciled': False,
+        'created_at': firebase_service._get_timestamp(),
+    })
+    print(f"📦 Submitted OpenAI batch {batch.id} with {len(lines)} URLs")
+    return {"batch_id": batch.id, "submitted": len(lines), "cached": cached, "errors": errors}
+
+
+# Seconds a reconcile claim holds a batch before another caller may take it over
+# (covers a worker that died mid-reconcile)
+_BATCH_RECONCILE_LEASE = 900
+
+
+def _owned_batch(firebase_service, batch_id, user_id):
+    """(doc_ref, record) for a batch submitted by `user_id`; KeyError if missing or someone else's."""
+    doc_ref = firebase_service.db.collection('classification_batches').document(batch_id)
+    snapshot = doc_ref.get()
+    record = (snapshot.to_dict() or {}) if snapshot.exists else None
+    if record is None or record.get('user_id') != user_id:
+        raise KeyError(batch_id)
+    return doc_ref, record
+
+
+def _batch_summary(batch_id, status, record):
+    summary = {"batch_id": batch_id, "status": status, "reconciled": bool(record.get('reconciled'))}
+    if record.get('reconciled'):
+        summary.update({"saved": record.get('saved', 0), "errors": record.get('errors') or []})
+    return summary
+
+
+def classification_batch_status(batch_id, user_id):
+    """OpenAI status of a batch owned by `user_id`; read-only."""
+    firebase_service = get_firebase_service()
+    doc_ref, record = _owned_batch(firebase_service, batch_id, user_id)
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != record.get('status'):
+        doc_ref.update({'status': batch.status})
+    return _batch_summary(batch_id, batch.status, record)
+
+
+def _claim_batch(firebase_service, doc_ref):
+    """Mark a batch as being reconciled; returns its record, or None if it is done or claimed."""
+    now = firebase_service._get_timestamp()
+
+    @firestore.transactional
+    def claim(transaction):
+        snapshot = doc_ref.get(transaction=transaction)
+        record = snapshot.to_dict() or {}
+        claimed_at = record.get('reconciling_at')
+        if record.get('reconciled'):
+            return None
+        if claimed_at and (now - claimed_at).total_seconds() < _BATCH_RECONCILE_LEASE:
+            return None
+        transaction.update(doc_ref, {'reconciling_at': now})
+        return record
+
+    return claim(firebase_service.db.transaction())
+
+
+def reconcile_classification_batch(batch_id, user_id):
+    """Once an OpenAI batch owned by `user_id` has completed, validate and store its classifications.
+
+    The batch is claimed in a Firestore transaction first, so concurrent calls store
+    the results and run the merge once; the others only report status.
+    """
+    firebase_service = get_firebase_service()
+    doc_ref, record = _owned_batch(firebase_service, batch_id, user_id)
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed" or record.get('reconciled') or not batch.output_file_id:
+        if batch.status != record.get('status'):
+            doc_ref.update({'status': batch.status})
+        return _batch_summary(batch_id, batch.status, record)
+
+    claimed = _claim_batch(firebase_service, doc_ref)
+    if claimed is None:
+        summary = _batch_summary(batch_id, batch.status, doc_ref.get().to_dict() or {})
+        summary.setdefault("reconciling", not summary["reconciled"])
+        return summary
+
+    try:
+        url_by_id = claimed.get('urls') or {}
+        saved, errors = 0, []
+        output = client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            url = None
+            try:
+                item = json.loads(line)
+                url = url_by_id.get(item.get("custom_id"))
+                if not url:
+                    continue
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    raise ValueError(f"OpenAI batch error: {item.get('error') or response.get('status_code')}")
+                content = response["body"]["choices"][0]["message"]["content"].strip()
+                try:
+                    result = _complete_classification(_loads_json(content))
+                except (json.JSONDecodeError, TypeError):
+                    raise ValueError("Failed to parse GPT response as valid JSON:\n" + content)
+                _store_classification(url, _normalize_and_validate_iab(result), firebase_service, user_id,
+                                      merge=False, as_of=claimed.get('created_at'))
+                saved += 1
+            except Exception as e:
+                errors.append({"url": url, "error": str(e)})
+    except Exception:
+        # Release the claim so a later call can retry
+        doc_ref.update({'reconciling_at': None})
+        raise
+
+    doc_ref.update({'status': batch.status, 'reconciled': True, 'reconciling_at': None, 'saved': saved, 'errors': errors})
+    if saved:
+        try:
+            merge_result = merge_attribution_data(user_id=user_id)
+            print(f"✅ Auto-merge after batch {batch_id}: {merge_result.get('success', False)}")
+        except Exception as e:
+            print(f"❌ Auto-merge failed (non-critical): {e}")
+    print(f"📦 Reconciled OpenAI batch {batch_id}: {saved} saved, {len(errors)} failed")
+    return {"batch_id": batch_id, "status": batch.status, "reconciled": True, "saved": saved, "errors": errors}
+
+
+@app.route("/classify-batch", methods=["POST"])
+def classify_batch():
+    try:
+        user_id = _verify_and_get_user_id()
+        data = request.get_json(force=True) or {}
+        urls = [u.strip() for u in (data.get("urls") or []) if isinstance(u, str) and u.strip()]
+        if not urls:
+            return jsonify({"error": "Provide a non-empty 'urls' list"}), 400
+        return jsonify(submit_classification_batch(urls, user_id=user_id, force_reclassify=bool(data.get("force_reclassify"))))
+    except PermissionError as pe:
+        return jsonify({'error': str(pe)}), 401
+    except Exception as e:
+        print(f"Error submitting classification batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/classify-batch/<batch_id>", methods=["GET"])
+def classify_batch_status(batch_id):
+    try:
+        user_id = _verify_and_get_user_id()
+        return jsonify(classification_batch_status(batch_id, user_id))
+    except PermissionError as pe:
+        return jsonify({'error': str(pe)}), 401
+    except KeyError:
+        return jsonify({'error': 'Batch not found'}), 404
+    except Exception as e:
+        print(f"Error reading classification batch {batch_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/classify-batch/<batch_id>/reconcile", methods=["POST"])
+def classify_batch_reconcile(batch_id):
+    try:
+        user_id = _verify_and_get_user_id()
+        return jsonify(reconcile_classification_batch(batch_id, user_id))
+    except PermissionError as pe:
+        return jsonify({'error': str(pe)}), 401
+    except KeyError:
+        return jsonify({'error': 'Batch not found'}), 404
+    except Exception as e:
+        print(f"Error reconciling classification batch {batch_id}: {e}")
+        return jsonify({'error': str(e)}), 500
 
 
 @app.route('/health', methods=['GET'])
@@ -1683,4 +2666,10 @@ def api_iab_taxonomy_debug():
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "5000"))
-    app.run(host="0.0.0.0", port=port)
+    try:
+        # Production-grade threaded WSGI server when available (deploys use gunicorn, see scripts/start.sh)
+        from waitress import serve
+    except ImportError:
+        app.run(host="0.0.0.0", port=port, threaded=True)
+    else:
+        serve(app, host="0.0.0.0", port=port, threads=int(os.getenv("WAITRESS_THREADS", "32")))
@@ -131,7 +131,7 @@ class AttributionClassificationMerger:
                 'success': True,
                 'message': 'Merge completed successfully',
                 'statistics': self.stats.copy(),
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': datetime.now(timezone.utc).isoformat()
             }
             
         except Exception as e:
@@ -143,7 +143,7 @@ class AttributionClassificationMerger:
                 'success': False,
                 'error': error_msg,
                 'statistics': self.stats.copy(),
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': datetime.now(timezone.utc).isoformat()
             }
     
     def _get_all_attribution_data(self) -> List[Dict[str, Any]]:
@@ -8,6 +8,8 @@ BACKEND_DATA = ROOT / "backend" / "data"
 FRONTEND_DATA = ROOT / "frontend" / "src" / "data"
 TSV_PATH = BACKEND_DATA / "IAB_Content_Taxonomy_3_1.tsv"
 JSON_PATH = FRONTEND_DATA / "iab_content_taxonomy_3_1.v1.json"
+CODE_RE = re.compile(r"IAB\d+(?:-\d+)*\Z")
+NAME_COLUMNS = ["Name", "Label", "Category", "Description"]
 
 
 def ensure_dirs():
@@ -26,18 +28,23 @@ def download_tsv():
 def parse_items(tsv_file):
     items = []
     with open(tsv_file, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        if not reader.fieldnames:
+        reader = csv.reader(f, delimiter="\t")
+        headers = next(reader, None)
+        if not headers:
             raise RuntimeError("[IAB-BUILD] IAB TSV has no header row")
+        # Resolve the name columns to indexes once (same precedence as before; last duplicate header wins)
+        pos = {h: i for i, h in enumerate(headers)}
+        name_idx = [pos[k] for k in NAME_COLUMNS if k in pos]
         for row in reader:
-            code = next((v for v in row.values() if v and re.match(r"^IAB\d+(?:-\d+)*$", v)), None)
-            name = row.get("Name") or row.get("Label") or row.get("Category") or row.get("Description")
+            # next() stops at the first matching cell, so only the columns up to the code column are tested
+            code = next((v for v in row if v and CODE_RE.match(v)), None)
+            name = next((row[i] for i in name_idx if i < len(row) and row[i]), None)
             if code and name:
-                items.append({"code": code.strip(), "name": name.strip()})
-    # sort by code path, then name
-    def code_key(c): return tuple(int(p) for p in c["code"][3:].split("-"))
-    items.sort(key=lambda r: (code_key(r), r["name"]))
-    return items
+                code, name = code.strip(), sys.intern(name.strip())
+                # sort key (code path, then name) is built here, once per row; the index keeps dicts out of comparisons
+                items.append((tuple(map(int, code[3:].split("-"))), name, len(items), {"code": code, "name": name}))
+    items.sort()
+    return [it[3] for it in items]
 
 
 def write_json(items):
@@ -8,6 +8,10 @@ from typing import Dict, Set, Any
 import requests
 
 
+# Commit SHA path segment in a pinned raw-file URL, e.g. .../<sha>/Content Taxonomy 3.1.tsv
+_COMMIT_SEGMENT_RE = re.compile(r'/[0-9a-fA-F]{7,40}/')
+
+
 class TaxonomyLoadError(Exception):
     pass
 
@@ -30,7 +34,7 @@ def _read_text(tsv_source: str) -> str:
 
 
 def _guess_commit_from_url(url: str) -> str:
-    m = re.search(r'/[0-9a-fA-F]{7,40}/', url)
+    m = _COMMIT_SEGMENT_RE.search(url)
     if m:
         return m.group(0).strip('/').split('/')[-1]
     return 'unversioned'
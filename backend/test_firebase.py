@@ -60,7 +60,7 @@ def test_firebase_connection():
         # Test recent classifications
         print("4. Testing recent classifications query...")
         recent = firebase_service.get_recent_classifications(limit=5)
-        print(f"✅ Retrieved {len(recent)} recent classifications")
+        print(f"✅ Retrieved {len(recent['items'])} recent classifications")
         
         print("\n🎉 All Firebase tests passed!")
         return True
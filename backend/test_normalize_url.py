@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests for normalize_url, which builds url_normalized (stored on every classification).
+Run with pytest, or directly: python test_normalize_url.py
+"""
+
+from mcp_server import normalize_url
+
+
+def test_docstring_examples():
+    assert normalize_url('https://www.site.com/page?x=1') == 'https://www.site.com/page'
+    assert normalize_url('http://www.site.com/page/#frag') == 'http://www.site.com/page'
+    assert normalize_url('www.site.com/page') == 'https://www.site.com/page'
+    assert normalize_url('SITE.com/Page/') == 'https://site.com/Page'
+    assert normalize_url('https://site.com') == 'https://site.com'
+
+
+def test_scheme_less_host_with_port():
+    # The urlparse version read 'site.com' as the scheme and returned 'site.com://8080/page'
+    assert normalize_url('site.com:8080/page') == 'https://site.com:8080/page'
+    assert normalize_url('Site.com:8080') == 'https://site.com:8080'
+
+
+def test_userinfo_and_port_are_kept():
+    assert normalize_url('https://user:pw@Site.com:8443/a/b') == 'https://user:pw@site.com:8443/a/b'
+
+
+def test_last_segment_params_dropped():
+    assert normalize_url('https://site.com/a;x/b;y?q=1') == 'https://site.com/a;x/b'
+
+
+def test_none():
+    assert normalize_url(None) == ''
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✅ {name}")
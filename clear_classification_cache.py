@@ -14,15 +14,16 @@ def clear_classification_cache():
     try:
         firebase_service = get_firebase_service()
         
-        # Get all documents in the classified_urls collection
-        docs = firebase_service.db.collection('classified_urls').stream()
-        
+        # Per-URL classifications plus the content-keyed result cache the classifier
+        # checks before calling OpenAI; both have to go for a real reclassification
         deleted_count = 0
-        for doc in docs:
-            doc.reference.delete()
-            deleted_count += 1
-            if deleted_count % 10 == 0:
-                print(f"Deleted {deleted_count} cached classifications...")
+        for collection in ('classified_urls', 'classifications_cache'):
+            docs = firebase_service.db.collection(collection).stream()
+            for doc in docs:
+                doc.reference.delete()
+                deleted_count += 1
+                if deleted_count % 10 == 0:
+                    print(f"Deleted {deleted_count} cached classifications...")
         
         print(f"✅ Successfully cleared {deleted_count} cached classifications")
         print("All URLs will now be reclassified with the new taxonomy and improved prompt!")
@@ -11,4 +11,9 @@ else
   pip show gunicorn || true
   exit 127
 fi
-exec gunicorn "$WSGI_PATH" --bind 0.0.0.0:"$PORT_TO_USE" --workers 2 --threads 8 --timeout 120
\ No newline at end of file
+# Threaded workers: classification and Firestore calls block on network IO, so
+# requests overlap on threads rather than needing one process each
+WORKERS="${WEB_CONCURRENCY:-2}"
+THREADS="${GUNICORN_THREADS:-16}"
+echo "[start] workers=$WORKERS threads=$THREADS"
+exec gunicorn "$WSGI_PATH" --bind 0.0.0.0:"$PORT_TO_USE" --worker-class gthread --workers "$WORKERS" --threads "$THREADS" --timeout 120
\ No newline at end of file